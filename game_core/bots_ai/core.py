@@ -1,11 +1,14 @@
 from ..game_engine.field import cell
 from ..game_engine.global_env.enums import Directions, Actions
-from ..game_engine.global_env.types import Position
+from ..game_engine.global_env.types import Position, intern_positions
+from ..game_engine.rules import get_bot_rules
 from .decision_making.decision_maker import DecisionMaker
 from .initial_generator import InitGenerator
 from .leaves_matcher import LeavesMatcher
+from .parallel_turn import ParallelTurnProcessor, is_available as is_parallel_available
 from .player_iterator import PlayerIterator
 from .field_handler.player_state import PlayerState
+from .field_handler.tree_node import Node
 from .utils import is_node_is_real
 
 
@@ -21,14 +24,28 @@ class BotAI:
         self.decision_maker = DecisionMaker(game_rules, self.players)
         self._player_iter = PlayerIterator(self.players)
         self._common_data = init_generator.common_data
+        bot_rules = get_bot_rules(game_rules)
+        self._compact_every: int = bot_rules['compact_every']
+        self._turns_processed = 0
+        self._turn_processor = ParallelTurnProcessor(
+            self.players, bot_rules['processes'], bot_rules['parallel_min_leaves'], bot_rules['split_leaves']) \
+            if bot_rules['processes'] and is_parallel_available() else None
 
     def turn_prepare(self, player_name: str, player_abilities: dict[Actions, bool]):
+        self._run_turn_step('_turn_prepare', player_name, player_abilities)
+
+    def _turn_prepare(self, player_name: str, player_abilities: dict[Actions, bool]):
         # before decision-making:
         # добавить клад под игроком если его там нет, но действие `swap_treasure` доступно
         for name, player_state in self.players.items():
             player_state.preprocess_turn(player_name, player_abilities)
         # удалить все свои листы с правильным спавном, которые противоречат листам противников
         self.leaves_matcher.match_real_spawn_leaves(player_name)
+        if self._common_data.is_dedupe_leaves:
+            self.dedupe_leaves()
+        if self._common_data.max_leaves:
+            for player_state in self.players.values():
+                player_state.resample_leaves()
 
     def make_decision(self, player_name: str,
                       player_abilities: dict[Actions, bool]) -> tuple[Actions, Directions | None]:
@@ -36,6 +53,9 @@ class BotAI:
         return self.decision_maker.make_decision(player_name, player_abilities)
 
     def process_turn_resp(self, raw_response: dict):
+        self._run_turn_step('_process_turn_resp', raw_response)
+
+    def _process_turn_resp(self, raw_response: dict):
         action = Actions[raw_response.get('action')]
         direction = Directions[raw_response.get('direction')] if raw_response.get('direction') else None
         player_name: str = raw_response.get('player_name')
@@ -46,8 +66,11 @@ class BotAI:
         if response.get('type_out_treasure'):
             self._common_data.players_with_treasures -= 1
             self._common_data.treasures_amount -= 1
-        for name, player_state in self.players.items():
-            player_state.process_turn(player_name, action, direction, response)
+        if self._turn_processor:
+            self._turn_processor.process_turn(player_name, action, direction, response)
+        else:
+            for name, player_state in self.players.items():
+                player_state.process_turn(player_name, action, direction, response)
 
         if action is not Actions.swap_treasure:
             next(self._player_iter)
@@ -55,6 +78,94 @@ class BotAI:
             for player_state in self.players.values():
                 player_state.process_host_turn()
             self._player_iter.is_host_turn = False
+        if self._common_data.is_dedupe_leaves:
+            self.dedupe_leaves()
+
+        self._turns_processed += 1
+        if self._compact_every and self._turns_processed % self._compact_every == 0:
+            self.compact_trees()
+
+    def _run_turn_step(self, step_name: str, *args):
+        getattr(self, step_name)(*args)
+        if not self._common_data.max_leaves:
+            return
+        for player_name, player_state in self.players.items():
+            if player_state.is_depleted():
+                self._reseed_leaves(player_name)
+
+    def _reseed_leaves(self, player_name: str):
+        """
+        recovers tree of player which lost all of its real spawn leaves by resampling,
+        its kept leaves become real spawn ones and are matched with all leaves of other players again,
+        it takes time bounded by size of trees
+        """
+        self.players[player_name].reseed_leaves()
+        self.leaves_matcher.reset_compatible_nodes(player_name)
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if '_turns_processed' not in state:
+            # bot pickled before bot rules were added, its game rules had none of them
+            self._compact_every = get_bot_rules({})['compact_every']
+            self._turns_processed = 0
+            self._turn_processor = None
+        intern_positions(self)
+
+    def compact_trees(self):
+        """compacts trees of all players and points compatible nodes of leaves to the nodes left in trees"""
+        replaced: dict[Node, Node] = {}
+        for player_state in self.players.values():
+            replaced.update(player_state.compact_tree())
+        self._update_compatible_nodes(replaced)
+
+    def dedupe_leaves(self):
+        """joins leaves with the same field states in trees of all players and points compatible nodes to them"""
+        replaced: dict[Node, Node] = {}
+        lost: dict[Node, list[Node]] = {}
+        for player_state in self.players.values():
+            player_replaced, player_lost = player_state.dedupe_leaves()
+            replaced.update(player_replaced)
+            lost.update(player_lost)
+        if replaced:
+            self._update_compatible_nodes(replaced, lost)
+
+    def _update_compatible_nodes(self, replaced: dict[Node, Node], lost: dict[Node, list[Node]] = None):
+        """
+        points compatible nodes of leaves to the nodes which took places of replaced ones
+
+        :param replaced: replaced nodes with the nodes which took their places
+        :param lost: nodes which lost leaves of their subtrees with the nodes which took places of these leaves,
+            the nodes are added to compatible nodes if they are not in subtrees of compatible nodes yet
+        """
+        lost = lost or {}
+        updated_lists: set[int] = set()
+        for player_state in self.players.values():
+            for leaf in player_state.get_leaf_nodes():
+                for compatible_nodes in leaf.compatible_with.values():
+                    if compatible_nodes is None or id(compatible_nodes) in updated_lists:
+                        continue
+                    updated_lists.add(id(compatible_nodes))
+                    added = [node for compatible_node in compatible_nodes
+                             for node in lost.get(compatible_node, [])]
+                    # nodes which took places of other ones are not kept twice
+                    roots = {node for node in compatible_nodes if node not in replaced}
+                    nodes = []
+                    for node in compatible_nodes:
+                        if node in replaced:
+                            node = replaced[node]
+                            if node.is_in_subtrees(roots):
+                                continue
+                            roots.add(node)
+                        nodes.append(node)
+                    for node in added:
+                        if not node.is_in_subtrees(roots):
+                            nodes.append(node)
+                            roots.add(node)
+                    compatible_nodes[:] = nodes
+                    # removed nodes are dropped from lists by matcher, only their data is released here
+                    for node in compatible_nodes:
+                        if node.field_state and node.is_deleted():
+                            node.release()
 
 
 class BotAIDebug(BotAI):
@@ -1,7 +1,10 @@
 from collections import Counter
 from random import choice
 
+from ...game_engine.field.line_of_sight import LineOfSight
 from ...game_engine.global_env.enums import Actions, Directions
+from ...game_engine.global_env.types import Position
+from ...game_engine.rules import get_bot_rules
 from .graph_builder import GraphBuilder
 from .target_calculator import TargetCalculator
 from ..field_handler.player_state import PlayerState
@@ -17,6 +20,13 @@ class DecisionMaker:
         self.target_calculators: dict[str, TargetCalculator] = {
             name: TargetCalculator(name, self.players_stats.copy())
             for name, stats in self.players_stats.items()}
+        self._is_factorized_opponents: bool = get_bot_rules(game_rules)['factorized_opponents']
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if '_is_factorized_opponents' not in state:
+            # decision maker pickled before bot rules were added, its game rules had none of them
+            self._is_factorized_opponents = get_bot_rules({})['factorized_opponents']
 
     def make_decision(self, player_name: str,
                       player_abilities: dict[Actions, bool]) -> tuple[Actions, Directions | None]:
@@ -43,20 +53,35 @@ class DecisionMaker:
 
     def _direction_to_shoot(self, leaf: Node, current_player_name: str) -> Directions | None:
         cur_pl_pos = leaf.field_state.get_player_pos(current_player_name)
-        other_pl_pos = [
-            pos for name, pos in leaf.field_state.players_positions.items()
-            if name != current_player_name and pos and self.players_stats.get(name).is_alive]
-
-        grid = leaf.field_state.field
-        allowed_directions = []
-        for direction in Directions:
-            start_position = cur_pl_pos
-            while start_position not in other_pl_pos:
-                if grid.get_cell(start_position).walls[direction].weapon_collision:
-                    break
-                start_position = grid.get_neighbour_cell(start_position, direction).position
-            else:
-                allowed_directions.append(direction)
+        other_pl_positions = [
+            positions for name in self.players
+            if name != current_player_name and self.players_stats.get(name).is_alive
+            and (positions := self._get_player_positions(leaf, name))]
+
+        line_of_sight = leaf.field_state.field.get_line_of_sight()
+        allowed_directions = [
+            direction for direction in Directions
+            if any(self._is_seen(line_of_sight, cur_pl_pos, direction, positions) for positions in other_pl_positions)]
         if not allowed_directions:
             return
         return choice(allowed_directions)
+
+    def _get_player_positions(self, leaf: Node, player_name: str) -> set[Position]:
+        """
+        :return: position of player known in leaf, in factorized mode candidate positions of player
+            are joined from its leaves compatible with leaf, if it is unknown
+        """
+        position = leaf.field_state.get_player_pos(player_name)
+        if position:
+            return {position}
+        if not self._is_factorized_opponents or not leaf.compatible_with.get(player_name):
+            return set()
+        return self.players.get(player_name).get_subtrees_positions(leaf.compatible_with[player_name])
+
+    @staticmethod
+    def _is_seen(line_of_sight: LineOfSight, position: Position, direction: Directions,
+                 positions: set[Position]) -> bool:
+        """returns True if most of candidate positions of player are seen from position by direction"""
+        seen = sum(line_of_sight.get_first_seen(position, direction, [other_position]) is not None
+                   for other_position in positions)
+        return 2 * seen > len(positions)
@@ -27,10 +27,11 @@ class TargetCalculator:
                     self.cur_pl_stats.bombs_max - self.cur_pl_stats.bombs),
             cell.CellExit: 15 if self.cur_pl_stats.has_treasure else 1,
         }
+        treasures_positions = set(field_state.treasures_positions)
         for target, path_len in graph.paths_len.items():
             try:
                 weight = cell_weight.get(type(target), 1) / path_len
-                if target.position in field_state.treasures_positions \
+                if target.position in treasures_positions \
                         and not self.cur_pl_stats.has_treasure \
                         and self.cur_pl_stats.get_allowed_abilities().get(Actions.swap_treasure):
                     weight *= 10
@@ -0,0 +1,185 @@
+from typing import Iterator, Type
+
+import numpy as np
+
+from ...game_engine.field import cell, wall
+from ...game_engine.global_env.enums import Directions
+from .field_obj import UnknownCell, UnknownWall, PossibleExit
+
+CELL_TYPES: list[type] = [
+    cell.NoneCell, cell.Cell,
+    cell.CellRiverMouth, cell.CellRiverBridge,
+    cell.CellExit, cell.CellClinic, cell.CellArmory,
+    cell.CellArmoryWeapon, cell.CellArmoryExplosive,
+    UnknownCell, PossibleExit,
+]
+
+CELL_CODES = {cell_type: code for code, cell_type in enumerate(CELL_TYPES)}
+# river cells are coded by their direction
+RIVER_CODES = {direction: len(CELL_TYPES) + code for code, direction in enumerate(Directions)}
+RIVER_DIRECTIONS = list(RIVER_CODES)
+
+
+def _get_compatible_codes() -> np.ndarray:
+    """returns table of cell codes which can be the same cell, it follows `GridBitboards.get_conflicts`"""
+    compatible = np.eye(len(CELL_TYPES) + len(RIVER_CODES), dtype=bool)
+    compatible[CELL_CODES[UnknownCell], :] = True
+    compatible[:, CELL_CODES[UnknownCell]] = True
+    for self_type, other_type in [(cell.NoneCell, PossibleExit), (cell.CellExit, PossibleExit),
+                                  (PossibleExit, cell.NoneCell), (PossibleExit, cell.CellExit)]:
+        compatible[CELL_CODES[self_type], CELL_CODES[other_type]] = True
+    return compatible
+
+
+COMPATIBLE_CODES = _get_compatible_codes()
+
+
+class GridBitboards:
+    """
+    Knowledge of bot grid packed into int bitboards
+
+    Bit `y * cols + x` of each bitboard stands for the cell at (x, y),
+    so comparison of two grids is a few bitwise operations instead of a loop over cells.
+    Grid is also available as a flat array of cell codes and river directions availability is memoized,
+    as they are derived from the same grid state.
+    Bitboards are not changed, bitboards of a changed grid are made by `updated` from the changed cells only
+
+    :ivar cols: number of columns in grid
+    :type cols: int
+    :ivar size: number of cells in grid
+    :type size: int
+    :ivar cells: bitboards of cells by cell type
+    :type cells: dict[Type[CELL], int]
+    :ivar rivers: bitboards of river cells by river direction
+    :type rivers: dict[Directions, int]
+    :ivar walls: bitboards of cells by direction and wall type
+    :type walls: dict[Directions, dict[Type[WALL], int]]
+    """
+    __slots__ = ('cols', 'size', 'cells', 'rivers', 'walls', '_codes', '_river_directions')
+
+    def __init__(self, field: list[list]):
+        self.cols = len(field[0])
+        self.size = self.cols * len(field)
+        self._codes: np.ndarray | None = None
+        self._river_directions: dict[tuple[int, int, Directions], bool] = {}
+        self.cells: dict[type, int] = {}
+        self.rivers: dict[Directions, int] = {direction: 0 for direction in Directions}
+        self.walls: dict[Directions, dict[type, int]] = {direction: {} for direction in Directions}
+        bit = 1
+        for row in field:
+            for grid_cell in row:
+                self._add_cell(grid_cell, bit)
+                bit <<= 1
+
+    def _add_cell(self, grid_cell, bit: int):
+        cell_type = type(grid_cell)
+        self.cells[cell_type] = self.cells.get(cell_type, 0) | bit
+        if cell_type is cell.CellRiver:
+            self.rivers[grid_cell.direction] |= bit
+        for direction, cell_wall in grid_cell.walls.items():
+            walls = self.walls[direction]
+            walls[type(cell_wall)] = walls.get(type(cell_wall), 0) | bit
+
+    def updated(self, field: list[list], changed: int) -> 'GridBitboards':
+        """
+        returns bitboards of grid built from these ones, only cells of `changed` bitboard are read from field
+
+        :param field: rows of cells of grid
+        :param changed: bitboard of cells changed since these bitboards were built
+        """
+        kept = ~changed
+        bitboards = GridBitboards.__new__(GridBitboards)
+        bitboards.cols, bitboards.size = self.cols, self.size
+        bitboards._river_directions = {}
+        bitboards.cells = {cell_type: bitboard & kept for cell_type, bitboard in self.cells.items()}
+        bitboards.rivers = {direction: bitboard & kept for direction, bitboard in self.rivers.items()}
+        bitboards.walls = {direction: {wall_type: bitboard & kept for wall_type, bitboard in walls.items()}
+                           for direction, walls in self.walls.items()}
+        codes = bitboards._codes = self._codes.copy() if self._codes is not None else None
+        for x, y in self.iter_coords(changed):
+            grid_cell = field[y][x]
+            index = y * self.cols + x
+            bitboards._add_cell(grid_cell, 1 << index)
+            if codes is not None:
+                codes[index] = RIVER_CODES[grid_cell.direction] \
+                    if type(grid_cell) is cell.CellRiver else CELL_CODES[type(grid_cell)]
+        return bitboards
+
+    def get_cells(self, *cell_types: Type) -> int:
+        """returns bitboard of cells of any of given types"""
+        bitboard = 0
+        for cell_type in cell_types:
+            bitboard |= self.cells.get(cell_type, 0)
+        return bitboard
+
+    def get_codes(self) -> np.ndarray:
+        """returns flat array of cell codes, see `CELL_CODES` and `RIVER_CODES`"""
+        if self._codes is None:
+            codes = np.empty(self.size, dtype=np.int8)
+            for cell_type, bitboard in self.cells.items():
+                if cell_type is not cell.CellRiver:
+                    codes[self._unpack(bitboard)] = CELL_CODES[cell_type]
+            for direction, bitboard in self.rivers.items():
+                codes[self._unpack(bitboard)] = RIVER_CODES[direction]
+            self._codes = codes
+        return self._codes
+
+    def _unpack(self, bitboard: int) -> np.ndarray:
+        """returns bitboard as a bool array"""
+        packed = np.frombuffer(bitboard.to_bytes((self.size + 7) // 8, 'little'), dtype=np.uint8)
+        return np.unpackbits(packed, count=self.size, bitorder='little').view(bool)
+
+    def get_river_directions(self) -> dict[tuple[int, int, Directions], bool]:
+        """returns memo of river directions availability by cell coords and direction"""
+        return self._river_directions
+
+    def get_walls(self, direction: Directions, wall_type: Type) -> int:
+        """returns bitboard of cells which have wall of given type in given direction"""
+        return self.walls[direction].get(wall_type, 0)
+
+    def get_conflicts(self, other: 'GridBitboards') -> int:
+        """
+        returns bitboard of cells which can't be the same cell in both grids
+
+        unknown cells are compatible with any cell, possible exits are compatible with exits and none cells,
+        rivers are compatible if they have the same direction
+        """
+        differs = 0
+        for cell_type in self.cells.keys() | other.cells.keys():
+            differs |= self.cells.get(cell_type, 0) ^ other.cells.get(cell_type, 0)
+        if not differs:
+            return self._get_river_conflicts(other)
+
+        none_cells, exits, possible_exits = cell.NoneCell, cell.CellExit, PossibleExit
+        compatible = (
+                self.get_cells(UnknownCell) | other.get_cells(UnknownCell) |
+                self.get_cells(none_cells, exits, possible_exits) & other.get_cells(possible_exits) |
+                self.get_cells(possible_exits) & other.get_cells(none_cells, exits))
+        return differs & ~compatible | self._get_river_conflicts(other)
+
+    def _get_river_conflicts(self, other: 'GridBitboards') -> int:
+        rivers = self.get_cells(cell.CellRiver) & other.get_cells(cell.CellRiver)
+        if not rivers:
+            return 0
+        conflicts = 0
+        for direction in Directions:
+            conflicts |= self.rivers[direction] & rivers & ~other.rivers[direction]
+        return conflicts
+
+    def get_merge_candidates(self, other: 'GridBitboards') -> int:
+        """returns bitboard of cells which may be changed by merging other grid into this one"""
+        candidates = (
+                self.get_cells(UnknownCell) & ~other.get_cells(UnknownCell) |
+                self.get_cells(PossibleExit) & other.get_cells(cell.CellExit, cell.NoneCell))
+        for direction in Directions:
+            candidates |= self.get_walls(direction, UnknownWall) & ~other.get_walls(direction, UnknownWall)
+            candidates |= self.get_walls(direction, wall.WallConcrete) & other.get_walls(direction, wall.WallEmpty)
+        return candidates
+
+    def iter_coords(self, bitboard: int) -> Iterator[tuple[int, int]]:
+        """yields (x, y) of set bits of bitboard in row-major order"""
+        while bitboard:
+            low_bit = bitboard & -bitboard
+            y, x = divmod(low_bit.bit_length() - 1, self.cols)
+            yield x, y
+            bitboard ^= low_bit
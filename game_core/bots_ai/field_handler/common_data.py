@@ -1,6 +1,7 @@
 from typing import Type
 
 from ...game_engine.field import cell
+from ...game_engine.rules import get_bot_rules
 from .field_obj import UnknownCell, PossibleExit
 from .grid import CELL
 from .player_stats import PlayerStats
@@ -13,6 +14,18 @@ class CommonData:
         self.compatible_cells = self._get_compatible_cells()
         self.treasures_amount: int = sum(self._rules.get('generator_rules').get('treasures'))
         self.players_with_treasures: int = 0
+        self._set_bot_rules()
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if 'max_leaves' not in state:
+            # data pickled before bot rules were added
+            self._set_bot_rules()
+
+    def _set_bot_rules(self):
+        bot_rules = get_bot_rules(self._rules)
+        self.is_dedupe_leaves: bool = bot_rules['dedupe_leaves']
+        self.max_leaves: int = bot_rules['max_leaves']
 
     def get_player_stats(self):
         return PlayerStats(self._rules)
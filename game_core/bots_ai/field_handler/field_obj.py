@@ -4,13 +4,11 @@ from ...game_engine.global_env.types import Position
 
 
 class UnknownWall(wall.WallEmpty):
-    def __init__(self):
-        super().__init__()
+    __slots__ = ()
 
 
 class UnbreakableWall(wall.WallOuter):
-    def __init__(self):
-        super().__init__()
+    __slots__ = ()
 
 
 class UnknownCell(cell.Cell):
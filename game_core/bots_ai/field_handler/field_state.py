@@ -1,3 +1,4 @@
+from collections import Counter
 from copy import copy
 from typing import Type
 
@@ -9,6 +10,7 @@ from ..exceptions import UnreachableState, MergingError
 from .field_obj import UnknownCell, UnknownWall, UnbreakableWall, PossibleExit
 from .grid import Grid, CELL, WALL
 from .common_data import CommonData
+from .zobrist import get_player_key, get_players_key, get_treasure_key, get_treasures_key, MASK
 
 
 class FieldState:
@@ -21,7 +23,9 @@ class FieldState:
                  players_positions: dict[str, Position | None],
                  common_data: CommonData,
                  treasures_positions: list[Position],
-                 current_player: str = ''):
+                 current_player: str = '',
+                 players_key: int | None = None,
+                 treasures_key: int | None = None):
         self.field = field
         self.players_positions = players_positions
         self.treasures_positions = treasures_positions
@@ -29,6 +33,15 @@ class FieldState:
         self.common_data = common_data
 
         self.current_player: str = current_player
+        # zobrist keys of players and treasures are calculated when hash is needed and kept up to date since then
+        self._players_key = players_key
+        self._treasures_key = treasures_key
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if '_players_key' not in state:
+            # state pickled before zobrist keys were kept
+            self._players_key = self._treasures_key = None
 
     def get_current_data(self):
         return self.field.get_field(), self.players_positions, self.treasures_positions
@@ -81,29 +94,58 @@ class FieldState:
                 return self._info_processor(response)
 
     def make_host_turn(self):
-        new_treasures_pos = self.treasures_positions.copy()
-        for treasure_position in self.treasures_positions:
+        for treasure_position in self.treasures_positions.copy():
             treasure_cell = self.field.get_cell(treasure_position)
             if type(treasure_cell) is cell.CellRiver:
                 new_cell = self.field.get_neighbour_cell(treasure_cell.position, treasure_cell.direction)
-                new_treasures_pos.remove(treasure_position)
+                self._remove_treasure(treasure_position)
                 if type(new_cell) is not UnknownCell:
-                    new_treasures_pos.append(new_cell.position)
-        self.treasures_positions = new_treasures_pos
+                    self._add_treasure(new_cell.position)
 
     def copy(self, player_position: tuple[str, Position] = None) -> 'FieldState':
-        return FieldState(
+        state = FieldState(
             self.field.copy(),
             self.remaining_obj_amount.copy(),
-            self.players_positions.copy() if not player_position else self._update_player_position(player_position),
+            self.players_positions.copy(),
             self.common_data,
             self.treasures_positions.copy(),
-            self.current_player)
+            self.current_player,
+            self._players_key,
+            self._treasures_key)
+        if player_position:
+            state._set_player_position(*player_position)
+        return state
+
+    def get_changes(self, rows: list[list[CELL]]) -> tuple:
+        """
+        returns changes of state made after it had given rows of grid,
+        they are small to be sent to another process, where they are applied to the state with these rows
 
-    def _update_player_position(self, player_position: tuple[str, Position]) -> dict[str, Position | None]:
-        pl_positions = self.players_positions.copy()
-        pl_positions[player_position[0]] = player_position[1]
-        return pl_positions
+        :param rows: rows of grid before changes, returned by `Grid.share_rows`
+        """
+        return (self.field.get_changed_rows(rows), self.remaining_obj_amount, self.players_positions,
+                self.treasures_positions, self.current_player, self._players_key, self._treasures_key)
+
+    def apply_changes(self, changes: tuple):
+        """applies changes returned by `get_changes` of the same state in another process"""
+        grid_changes, self.remaining_obj_amount, self.players_positions, self.treasures_positions, \
+            self.current_player, self._players_key, self._treasures_key = changes
+        self.field.set_changed_rows(grid_changes)
+
+    def get_hash(self) -> int:
+        """returns zobrist hash of state, its parts are kept up to date by grid and by state"""
+        if self._players_key is None:
+            self._players_key = get_players_key(self.players_positions)
+        if self._treasures_key is None:
+            self._treasures_key = get_treasures_key(self.treasures_positions)
+        return self.field.get_hash() ^ self._players_key ^ self._treasures_key
+
+    def is_same(self, other_state: 'FieldState') -> bool:
+        """returns True if states have the same grid, players positions, treasures and remaining objects"""
+        return (self.players_positions == other_state.players_positions and
+                self.remaining_obj_amount == other_state.remaining_obj_amount and
+                Counter(self.treasures_positions) == Counter(other_state.treasures_positions) and
+                self.field.is_same(other_state.field))
 
     def merge_with(self, other_state: 'FieldState'):
         self.field.merge_with(other_state.field, self.remaining_obj_amount)
@@ -112,7 +154,23 @@ class FieldState:
         return self
 
     def _move_player(self, position: Position):
-        self.players_positions[self.current_player] = position
+        self._set_player_position(self.current_player, position)
+
+    def _set_player_position(self, player_name: str, position: Position):
+        if self._players_key is not None:
+            self._players_key ^= get_player_key(player_name, self.players_positions[player_name]) ^ \
+                get_player_key(player_name, position)
+        self.players_positions[player_name] = position
+
+    def _add_treasure(self, position: Position):
+        if self._treasures_key is not None:
+            self._treasures_key = (self._treasures_key + get_treasure_key(position)) & MASK
+        self.treasures_positions.append(position)
+
+    def _remove_treasure(self, position: Position):
+        if self._treasures_key is not None:
+            self._treasures_key = (self._treasures_key - get_treasure_key(position)) & MASK
+        self.treasures_positions.remove(position)
 
     def _update_cell_type(self, new_type: Type[CELL], position: Position, direction: Directions = None):
         target_cell = self.field.get_cell(position)
@@ -188,14 +246,14 @@ class FieldState:
             # сделать копию без каждого из кладов
             for treasure_pos in self.treasures_positions:
                 next_state = self.copy()
-                next_state.treasures_positions.remove(treasure_pos)
+                next_state._remove_treasure(treasure_pos)
                 # todo add logic here: position of player may be updated
                 next_states.append(next_state)
             return next_states
         had_treasure: bool = response.get('had_treasure')  # был ли в руках клад до смены
         if not had_treasure:
             current_cell = self.get_player_cell()
-            self.treasures_positions.remove(current_cell.position)
+            self._remove_treasure(current_cell.position)
         # else при текущем способе хранения позиций кладов ничего не изменится
         return []  # todo
 
@@ -482,25 +540,26 @@ class FieldState:
     def _merge_treasures(self, other_treasures: list[Position]):
         if not other_treasures:
             return
-        d_treasures = self.treasures_positions.copy()
-        d_other_treasures = other_treasures.copy()
+        remaining_treasures = Counter(self.treasures_positions)
+        d_other_treasures = []
         for treasure_pos in other_treasures:
-            if treasure_pos in d_treasures:
-                d_treasures.remove(treasure_pos)
-                d_other_treasures.remove(treasure_pos)
-        merged_treasures_pos = self.treasures_positions + d_other_treasures
-        if len(merged_treasures_pos) + self.common_data.players_with_treasures > self.common_data.treasures_amount:
+            if remaining_treasures[treasure_pos]:
+                remaining_treasures[treasure_pos] -= 1
+            else:
+                d_other_treasures.append(treasure_pos)
+        if len(self.treasures_positions) + len(d_other_treasures) + self.common_data.players_with_treasures > \
+                self.common_data.treasures_amount:
             raise MergingError()
-        self.treasures_positions = merged_treasures_pos
+        for treasure_pos in d_other_treasures:
+            self._add_treasure(treasure_pos)
 
     def _merge_players_positions(self, other_state_positions: dict[str, Position | None]):
         for player, position in self.players_positions.items():
             if position is None and other_state_positions[player]:
-                self.players_positions[player] = other_state_positions[player]
+                self._set_player_position(player, other_state_positions[player])
             if position and other_state_positions[player] and position != other_state_positions[player]:
                 raise MergingError
 
     def _check_treasures_amount(self, cell_treasures_amount: int, position: Position):
-        tr_pos_amount = len([pos for pos in self.treasures_positions if pos == position])
-        if tr_pos_amount > cell_treasures_amount:
+        if self.treasures_positions.count(position) > cell_treasures_amount:
             raise UnreachableState()
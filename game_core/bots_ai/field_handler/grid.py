@@ -2,10 +2,15 @@ from copy import copy
 from typing import Union, Type
 
 from ...game_engine.field import cell, wall
+from ...game_engine.field.line_of_sight import LineOfSight
 from ...game_engine.global_env.enums import Directions
 from ...game_engine.global_env.types import Position
 from ..exceptions import MergingError, OnlyAllowedDir
+from .bitboards import GridBitboards
 from .field_obj import UnknownCell, UnbreakableWall, UnknownWall, PossibleExit
+from .river_index import RiverIndex
+from .signature import GridSignature
+from .zobrist import get_cell_key, get_walls_key
 
 CELL = Union[cell.CELL, UnknownCell, PossibleExit]
 
@@ -18,8 +23,34 @@ WALL = Union[R_WALL, UnbreakableWall, UnknownWall]
 
 
 class Grid:
-    def __init__(self, field: list[list[CELL]]):
+    """
+    Bot field grid
+
+    Copies of grid share rows, a row is copied on the first write to it,
+    so a copy allocates only the rows it changes.
+    Bitboards of grid are built on demand and shared with copies, grid tracks cells changed since they were built
+    and only these cells are updated in bitboards on the next demand.
+    River index of grid is built on demand, it is shared with copies as rows are and updated on each change of a cell.
+    Signature of grid is built on demand and updated on each change of a cell, copies share it as it is immutable.
+    Zobrist hash of grid is calculated on demand, it is shared with copies and updated on each change of a cell
+
+    :param field: rows of cells, they are not changed by grid
+    :type field: list[list[CELL]]
+    """
+    def __init__(self, field: list[list[CELL]], bitboards: GridBitboards | None = None,
+                 zobrist_hash: int | None = None, river_index: RiverIndex | None = None,
+                 signature: GridSignature | None = None, changed_cells: int = 0):
         self._field = field
+        self._own_rows: set[int] = set()
+        self._line_of_sight: LineOfSight | None = None
+        self._bitboards = bitboards
+        # bitboard of cells changed since bitboards were built
+        self._changed_cells = changed_cells
+        self._river_index = river_index
+        self._is_own_river_index = False
+        self._signature = signature
+        # zobrist hash is None until it is demanded
+        self._hash = zobrist_hash
 
     def get_field(self) -> list[list[CELL]]:
         return self._field
@@ -46,13 +77,144 @@ class Grid:
             return None
 
     def set_cell(self, new_cell: CELL, position: Position):
-        self._field[position.y][position.x] = new_cell
+        self._set_cell_at(position.x, position.y, new_cell)
+
+    def _set_cell_at(self, x: int, y: int, new_cell: CELL):
+        row = self._get_own_row(y)
+        index = y * len(row) + x
+        old_cell = row[x]
+        if self._hash is not None:
+            self._hash ^= get_cell_key(index, old_cell) ^ get_cell_key(index, new_cell)
+        row[x] = new_cell
+        self._mark_changed(x, y)
+        if type(old_cell) is not type(new_cell) or \
+                getattr(old_cell, 'direction', None) is not getattr(new_cell, 'direction', None):
+            self._update_cell_type_indexes(x, y, old_cell, new_cell)
+
+    def _update_cell_type_indexes(self, x: int, y: int, old_cell: CELL, new_cell: CELL):
+        """updates indexes which depend on types of cells only"""
+        if self._signature is not None:
+            self._signature = self._signature.update(y * len(self._field[y]) + x, old_cell, new_cell)
+        if self._river_index is not None:
+            if not self._is_own_river_index:
+                self._river_index = self._river_index.copy()
+                self._is_own_river_index = True
+            self._river_index.update(self._field, x, y, old_cell, new_cell)
+
+    def _get_own_row(self, y: int) -> list[CELL]:
+        """returns row which is not shared with other grids"""
+        if y not in self._own_rows:
+            self._field[y] = self._field[y].copy()
+            self._own_rows.add(y)
+        return self._field[y]
+
+    def _mark_changed(self, x: int, y: int):
+        self._line_of_sight = None
+        if self._bitboards is not None:
+            self._changed_cells |= 1 << y * len(self._field[y]) + x
+
+    def _reset_indexes(self):
+        self._line_of_sight = None
+        self._bitboards = None
+        self._changed_cells = 0
+
+    def get_bitboards(self) -> GridBitboards:
+        """returns bitboards of grid, cells changed since the last call are updated in them"""
+        if self._bitboards is None:
+            self._bitboards = GridBitboards(self._field)
+        elif self._changed_cells:
+            self._bitboards = self._bitboards.updated(self._field, self._changed_cells)
+            self._changed_cells = 0
+        return self._bitboards
+
+    def get_river_index(self) -> RiverIndex:
+        """returns river index of grid, it is kept up to date by grid"""
+        if self._river_index is None:
+            self._river_index = RiverIndex(self._field)
+            self._is_own_river_index = True
+        return self._river_index
+
+    def get_signature(self) -> GridSignature:
+        """returns signature of grid, it is kept up to date by grid"""
+        if self._signature is None:
+            self._signature = GridSignature.from_field(self._field)
+        return self._signature
+
+    def get_hash(self) -> int:
+        """returns zobrist hash of cells and walls of grid, it is kept up to date by grid after the first call"""
+        if self._hash is None:
+            self._hash = self._calc_hash()
+        return self._hash
+
+    def _calc_hash(self) -> int:
+        zobrist_hash = 0
+        for y, row in enumerate(self._field):
+            for x, grid_cell in enumerate(row):
+                zobrist_hash ^= get_cell_key(y * len(row) + x, grid_cell)
+        return zobrist_hash
+
+    def is_same(self, other: 'Grid') -> bool:
+        """returns True if grids have the same cells and walls"""
+        for row, other_row in zip(self._field, other._field):
+            if row is other_row:
+                continue
+            for grid_cell, other_cell in zip(row, other_row):
+                if grid_cell is other_cell:
+                    continue
+                if type(grid_cell) is not type(other_cell) or grid_cell.walls != other_cell.walls:
+                    return False
+                if getattr(grid_cell, 'direction', None) is not getattr(other_cell, 'direction', None):
+                    return False
+        return True
+
+    def get_line_of_sight(self) -> LineOfSight:
+        """returns line of sight index, it is kept until the grid is changed"""
+        if self._line_of_sight is None:
+            self._line_of_sight = LineOfSight(self)
+        return self._line_of_sight
 
     def copy(self) -> 'Grid':
-        return Grid([copy(row) for row in self._field])
+        self._own_rows = set()
+        self._is_own_river_index = False
+        return Grid(self._field.copy(), self._bitboards, self._hash, self._river_index, self._signature,
+                    self._changed_cells)
+
+    def share_rows(self) -> list[list[CELL]]:
+        """returns rows of grid, they are copied on the next write to grid, see `get_changed_rows`"""
+        self._own_rows = set()
+        return self._field.copy()
+
+    def get_changed_rows(self, rows: list[list[CELL]]) -> tuple[dict[int, list[CELL]], int | None]:
+        """
+        returns rows of grid by their index, which are not the given rows returned by `share_rows`,
+        and zobrist hash of grid if it is calculated
+        """
+        return {y: row for y, (row, base_row) in enumerate(zip(self._field, rows)) if row is not base_row}, self._hash
+
+    def set_changed_rows(self, changes: tuple[dict[int, list[CELL]], int | None]):
+        """
+        sets rows changed in a copy of grid, see `get_changed_rows`,
+        rows may be given to other grids with the same changes, so they are copied on the next write
+        """
+        rows, zobrist_hash = changes
+        for y, row in rows.items():
+            self._field[y] = row
+            self._own_rows.discard(y)
+        self._hash = zobrist_hash
+        self._reset_indexes()
+        self._river_index = None
+        self._signature = None
 
     def set_walls(self, position: Position, walls: dict[Directions, WALL]):
-        self._field[position.y][position.x].walls = walls
+        self._set_walls_at(position.x, position.y, walls)
+
+    def _set_walls_at(self, x: int, y: int, walls: dict[Directions, WALL]):
+        grid_cell = self._field[y][x]
+        if self._hash is not None:
+            index = y * len(self._field[y]) + x
+            self._hash ^= get_walls_key(index, grid_cell.walls) ^ get_walls_key(index, walls)
+        grid_cell.walls = walls
+        self._mark_changed(x, y)
 
     def add_wall(self, position: Position, direction: Directions, wall_type: Type[WALL],
                  neighbour_wall_type: Type[WALL] = None) -> bool:
@@ -68,9 +230,10 @@ class Grid:
     def update_wall(self, position: Position, direction: Directions, wall_type: Type[WALL]) -> bool:
         if type(self.get_cell(position).walls[direction]) is wall_type:
             return False
+        walls = self.get_cell(position).walls.copy()
+        walls[direction] = wall_type()
         self.set_cell(copy(self.get_cell(position)), position)
-        self.set_walls(position, self.get_cell(position).walls.copy())
-        self.get_cell(position).add_wall(direction, wall_type())
+        self.set_walls(position, walls)
         return True
 
     def create_exit(self, direction: Directions, position: Position) -> None:
@@ -88,7 +251,7 @@ class Grid:
                 if type(neighbour_cell) is cell.CellExit:
                     continue
                 self.update_wall(neighbour_cell.position, -dir_, wall.WallOuter)
-        self.get_neighbour_cell(position, direction).add_wall(-direction, wall.WallExit())
+        self.update_wall(self.get_neighbour_cell(position, direction).position, -direction, wall.WallExit)
         self.set_cell(cell_exit, cell_exit.position)
 
     def get_possible_river_directions(self,
@@ -158,6 +321,22 @@ class Grid:
             return False
         return True
 
+    def is_river_direction_available_at(self, x: int, y: int, direction: Directions) -> bool:
+        """
+
+        :param x: x coord of cell to be checked
+        :param y: y coord of cell to be checked
+        :param direction: direction to be checked
+        :return: result of `is_river_direction_available` with no_raise, it is kept until the grid is changed
+        """
+        river_directions = self.get_bitboards().get_river_directions()
+        try:
+            return river_directions[x, y, direction]
+        except KeyError:
+            return river_directions.setdefault(
+                (x, y, direction),
+                self.is_river_direction_available(self._field[y][x], direction, no_raise=True))
+
     def is_cause_of_isolated_mouth(self, position: Position) -> bool:
         for direction in Directions:
             neighbour_cell = self.get_neighbour_cell(position, direction)
@@ -174,13 +353,7 @@ class Grid:
         :param ignore_dir: if True all directions will be checked
         :return: True if target_cell has known input river
         """
-        neg_direction = -turn_direction if not ignore_dir else None
-        for direction in Directions:
-            if not ignore_dir and direction is neg_direction:
-                continue
-            neighbour_cell = self.get_neighbour_cell(position, direction)
-            if type(neighbour_cell) is cell.CellRiver and neighbour_cell.direction is -direction:
-                return True
+        return self.get_river_index().has_inflow(position.x, position.y, -turn_direction if not ignore_dir else None)
 
     def _is_the_only_allowed_dir(self, position: Position, turn_direction: Directions) -> bool:
         """
@@ -189,14 +362,7 @@ class Grid:
         :param turn_direction: direction of turn
         :return: True if target cell have only 1 possible direction to input
         """
-        for direction in Directions:
-            if direction is -turn_direction:
-                continue
-            neighbour_cell = self.get_neighbour_cell(position, direction)
-            if (type(neighbour_cell) is cell.CellRiver and neighbour_cell.direction is -direction) or \
-                    type(neighbour_cell) is UnknownCell:
-                return False
-        return True
+        return not self.get_river_index().has_input(position.x, position.y, -turn_direction)
 
     def is_river_is_looped(self, start_position: Position, previous_cell: CELL) -> bool:
         """
@@ -205,12 +371,17 @@ class Grid:
         :param previous_cell: previous river cell
         :return: True if river is circled
         """
-        if start_position == previous_cell.position:
-            return True
-        if type(previous_cell) is cell.CellRiver:
-            return self.is_river_is_looped(
-                start_position, self.get_neighbour_cell(previous_cell.position, previous_cell.direction))
-        return False
+        if type(previous_cell) is not cell.CellRiver:
+            return start_position == previous_cell.position
+        river_index = self.get_river_index()
+        head, distance = river_index.get_chain(previous_cell.position.x, previous_cell.position.y)
+        start_head, start_distance = river_index.get_chain(start_position.x, start_position.y)
+        if head != start_head or start_distance > distance:
+            return False
+        # cell with the same head and closer to it is downstream, if rivers don't join each other
+        for _ in range(distance - start_distance):
+            previous_cell = self.get_neighbour_cell(previous_cell.position, previous_cell.direction)
+        return previous_cell.position == start_position
 
     @staticmethod
     def is_washed(current_cell: cell.CellRiver, prev_cell: CELL, turn_direction: Directions) -> bool:
@@ -226,44 +397,66 @@ class Grid:
                    other_field: 'Grid',
                    remaining_obj_amount: dict[Type[cell.CELL], int]):
         is_changed = False
-        for y, row in enumerate(self._field):
-            for x, self_cell in enumerate(row):
-                other_cell = other_field._field[y][x]
-                if type(self_cell) is cell.NoneCell and type(other_cell) is cell.NoneCell:
-                    continue
-                if type(self_cell) is PossibleExit and type(other_cell) in [cell.CellExit, cell.NoneCell]:
-                    is_changed = True
-                    self.merge_cells(other_cell, x, y, no_walls=True)
-                if type(self_cell) is cell.CellExit and type(other_cell) is PossibleExit:
-                    continue
-                if type(self_cell) is UnknownCell and type(other_cell) is not UnknownCell:
-                    if type(other_cell) is cell.CellRiver:
-                        if not self.is_river_direction_available(self_cell, other_cell.direction, no_raise=True):
-                            raise MergingError()
-                    is_changed = True
-                    if type(other_cell) in remaining_obj_amount:
-                        if remaining_obj_amount.get(type(other_cell)) > 0:
-                            remaining_obj_amount[type(other_cell)] -= 1
-                        else:
-                            raise MergingError()
-                    self.merge_cells(other_cell, x, y)
-                new_walls = self.merge_walls(self._field[y][x].walls.copy(), other_cell.walls)
-                if new_walls:
-                    is_changed = True
-                    self._field[y][x] = copy(self._field[y][x])
-                    self._field[y][x].walls = new_walls
+        bitboards = self.get_bitboards()
+        # only cells which differ from other grid are visited, in the same row-major order
+        for x, y in bitboards.iter_coords(bitboards.get_merge_candidates(other_field.get_bitboards())):
+            self_cell = self._field[y][x]
+            other_cell = other_field._field[y][x]
+            if type(self_cell) is cell.NoneCell and type(other_cell) is cell.NoneCell:
+                continue
+            if type(self_cell) is PossibleExit and type(other_cell) in [cell.CellExit, cell.NoneCell]:
+                is_changed = True
+                self.merge_cells(other_cell, x, y, no_walls=True)
+            if type(self_cell) is cell.CellExit and type(other_cell) is PossibleExit:
+                continue
+            if type(self_cell) is UnknownCell and type(other_cell) is not UnknownCell:
+                if type(other_cell) is cell.CellRiver:
+                    if not self.is_river_direction_available(self_cell, other_cell.direction, no_raise=True):
+                        raise MergingError()
+                is_changed = True
+                if type(other_cell) in remaining_obj_amount:
+                    if remaining_obj_amount.get(type(other_cell)) > 0:
+                        remaining_obj_amount[type(other_cell)] -= 1
+                    else:
+                        raise MergingError()
+                self.merge_cells(other_cell, x, y)
+            new_walls = self.merge_walls(self._field[y][x].walls.copy(), other_cell.walls)
+            if new_walls:
+                is_changed = True
+                self._set_cell_at(x, y, copy(self._field[y][x]))
+                self._set_walls_at(x, y, new_walls)
         if is_changed:
             return self
         return
 
     def merge_cells(self, other_cell: CELL, x: int, y: int, no_walls: bool = False):
-        self._field[y][x] = copy(other_cell)
+        self._set_cell_at(x, y, copy(other_cell))
         if not no_walls:
             new_walls = self.merge_walls(self._field[y][x].walls.copy(), other_cell.walls)
             if new_walls:
-                self._field[y][x].walls = new_walls
+                self._set_walls_at(x, y, new_walls)
         else:
-            self._field[y][x].walls = other_cell.walls.copy()
+            self._set_walls_at(x, y, other_cell.walls.copy())
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_line_of_sight'] = None
+        state['_bitboards'] = None
+        state['_changed_cells'] = 0
+        state['_river_index'] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        self._line_of_sight = None
+        self._bitboards = None
+        self._changed_cells = 0
+        self._river_index = None
+        self._is_own_river_index = False
+        self._signature = None
+        self.__dict__.update(state)
+        self._own_rows = set()
+        if '_hash' not in state:
+            self._hash = None
 
     @staticmethod
     def merge_walls(self_walls: dict[Directions, WALL], other_walls: dict[Directions, WALL]):
@@ -272,10 +465,10 @@ class Grid:
             if type(self_walls[direction]) is not type(other_walls[direction]):
                 if type(self_walls[direction]) is UnknownWall:
                     is_changed = True
-                    self_walls[direction] = copy(other_walls[direction])
+                    self_walls[direction] = other_walls[direction]
                 if type(self_walls[direction]) is wall.WallConcrete and type(other_walls[direction]) is wall.WallEmpty:
                     is_changed = True
-                    self_walls[direction] = copy(other_walls[direction])
+                    self_walls[direction] = other_walls[direction]
         if is_changed:
             return self_walls
         return
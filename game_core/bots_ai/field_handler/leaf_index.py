@@ -0,0 +1,128 @@
+from typing import TYPE_CHECKING, Iterator
+
+if TYPE_CHECKING:
+    from .tree_node import Node
+
+
+class LeafIndex:
+    """
+    Leaves of a tree in depth-first order, nodes of the tree keep it up to date
+
+    Leaves are linked with each other, so a leaf which gets next states is replaced by them in place.
+    Each node of the tree knows if path from root to it is compatible with each enemy
+    and if all nodes on this path have real spawn, root itself is not checked
+
+    :param root: root of the tree
+    :type root: Node
+    """
+    def __init__(self, root: 'Node'):
+        self._root = root
+        self._next: dict['Node', 'Node | None'] = {}
+        self._prev: dict['Node', 'Node | None'] = {}
+        self._first: 'Node | None' = None
+
+        root.leaf_index = self
+        root.path_compatibility = {player: True for player in root.enemy_compatibility}
+        root.is_path_real_spawn = True
+        self._link_leaves(self._index_subtree(root), None)
+
+    def __iter__(self) -> Iterator['Node']:
+        leaf = self._first
+        while leaf is not None:
+            yield leaf
+            leaf = self._next[leaf]
+
+    def get_subtree_leaves(self, root: 'Node') -> list['Node']:
+        """returns leaves of subtree, they are next to each other in depth-first order"""
+        first, last = root, root
+        while first.next_states:
+            first = first.next_states[0]
+        while last.next_states:
+            last = last.next_states[-1]
+        leaves = [first]
+        while leaves[-1] is not last:
+            leaves.append(self._next[leaves[-1]])
+        return leaves
+
+    def add_child(self, parent: 'Node', child: 'Node'):
+        """links leaves of child subtree, child is the last of parent next states"""
+        leaves = self._index_subtree(child)
+        if len(parent.next_states) == 1:
+            after = self._prev[parent]
+            self._unlink(parent)
+        else:
+            after = parent.next_states[-2]
+            while after.next_states:
+                after = after.next_states[-1]
+        self._link_leaves(leaves, after)
+
+    def remove_child(self, parent: 'Node', child: 'Node'):
+        """unlinks leaves of removed child subtree, root without next states becomes a leaf"""
+        for leaf in self._iter_subtree_leaves(child):
+            if leaf in self._next:
+                self._unlink(leaf)
+        if not parent.next_states and parent is self._root:
+            self._link_leaves([parent], None)
+
+    def update_compatibility(self, node: 'Node', player_name: str):
+        """updates path compatibility of node and of its subtree if it is changed"""
+        stack = [node] if node is not self._root else []
+        while stack:
+            current = stack.pop()
+            is_compatible = current.enemy_compatibility[player_name] and \
+                current.get_parent().path_compatibility[player_name]
+            if current.path_compatibility[player_name] is is_compatible:
+                continue
+            current.path_compatibility[player_name] = is_compatible
+            stack.extend(current.next_states)
+
+    def _index_subtree(self, root: 'Node') -> list['Node']:
+        """sets index and path flags to nodes of subtree, returns its leaves in depth-first order"""
+        leaves = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            node.leaf_index = self
+            if node is not self._root:
+                parent = node.get_parent()
+                node.path_compatibility = {
+                    player: is_compatible and node.enemy_compatibility[player]
+                    for player, is_compatible in parent.path_compatibility.items()}
+                node.is_path_real_spawn = parent.is_path_real_spawn and node.is_real_spawn
+            if not node.next_states:
+                leaves.append(node)
+            stack.extend(reversed(node.next_states))
+        return leaves
+
+    @staticmethod
+    def _iter_subtree_leaves(root: 'Node') -> Iterator['Node']:
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if not node.next_states:
+                yield node
+            stack.extend(reversed(node.next_states))
+
+    def _link_leaves(self, leaves: list['Node'], after: 'Node | None'):
+        """links leaves after given leaf, or at the beginning if it is None"""
+        following = self._next[after] if after is not None else self._first
+        previous = after
+        for leaf in leaves:
+            self._prev[leaf] = previous
+            if previous is None:
+                self._first = leaf
+            else:
+                self._next[previous] = leaf
+            previous = leaf
+        self._next[previous] = following
+        if following is not None:
+            self._prev[following] = previous
+
+    def _unlink(self, leaf: 'Node'):
+        previous, following = self._prev.pop(leaf), self._next.pop(leaf)
+        if previous is None:
+            self._first = following
+        else:
+            self._next[previous] = following
+        if following is not None:
+            self._prev[following] = previous
@@ -1,33 +1,68 @@
+from math import log
+from random import Random
 from typing import Type
 
 from ...game_engine.field import cell
 from ...game_engine.global_env.enums import Actions, Directions
+from ...game_engine.global_env.types import Position
 from ..exceptions import UnreachableState, IncompatibleState, MergingError
+from .leaf_index import LeafIndex
 from .tree_node import Node
 from .common_data import CommonData
+from .field_obj import UnknownCell
+from .field_state import FieldState
+from .zobrist import TranspositionTable
 
 
 class PlayerState:
     def __init__(self, tree_root: Node, common_data: CommonData, name: str):
         self._root = tree_root
+        self._leaf_index = LeafIndex(tree_root)
         self.common_data = common_data
         self.name = name
         self.stats = self.common_data.get_player_stats()
+        self._random = Random(name)
 
-    def process_turn(self, player_name: str, action: Actions, direction: Directions | None, response: dict):
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if '_leaf_index' not in state:
+            # state pickled before leaves were indexed
+            self._leaf_index = LeafIndex(self._root)
+            self._random = Random(self.name)
+
+    def process_turn(self, player_name: str, action: Actions, direction: Directions | None, response: dict,
+                     leaves_next_states: list[list[FieldState] | None] = None):
+        """
+
+        :param leaves_next_states: next states of leaves in reversed order, which are processed in worker processes,
+            None for removed leaf, if it is given, leaves are not processed but get these next states
+        """
         # before turn processing:
         # делать ход во всех своих листах, которые противники считают возможными,
         # то есть хотя бы 1 противник думает что данный лист возможен
         # и во всех листах с настоящим спавном
 
         self._handle_stats_changes(player_name, action, response)
-        for node in self.get_leaf_nodes()[::-1]:
-            try:
-                if node.check_compatibility():
-                    next_states = node.field_state.process_action(player_name, action, direction, response)
-                    [node.add_next_state(state) for state in next_states]
-            except (UnreachableState, IncompatibleState, MergingError):
-                node.remove()
+        if leaves_next_states is not None:
+            for node, next_states in zip(self.get_leaf_nodes()[::-1], leaves_next_states):
+                if next_states is None:
+                    node.remove()
+                else:
+                    self._add_next_states(node, next_states)
+        else:
+            for node in self.get_leaf_nodes()[::-1]:
+                try:
+                    if node.check_compatibility():
+                        self._add_next_states(
+                            node, node.field_state.process_action(player_name, action, direction, response))
+                except (UnreachableState, IncompatibleState, MergingError):
+                    node.remove()
+        if self.common_data.max_leaves:
+            self.resample_leaves()
+
+    def _add_next_states(self, node: Node, next_states: list[FieldState]):
+        [node.add_next_state(state) for state in next_states]
+        node.split_weight()
 
     def preprocess_turn(self, player_name: str, player_allowed_abilities: dict[Actions, bool]):
         for node in self.get_leaf_nodes()[::-1]:
@@ -76,13 +111,115 @@ class PlayerState:
             if self.name in dmg_pls:
                 self.stats.on_take_dmg()
 
+    def resample_leaves(self):
+        """
+        keeps at most `max_leaves` leaves, real spawn leaves are kept first,
+        others are sampled by their weight and by the number of enemies they are compatible with
+        """
+        leaves = self.get_leaf_nodes()
+        if len(leaves) > self.common_data.max_leaves:
+            # weighted sampling without replacement: the largest keys log(u) / weight are sampled
+            keys = {
+                leaf: (leaf.is_path_real_spawn,
+                       log(1 - self._random.random()) / (leaf.weight * (1 + sum(leaf.path_compatibility.values()))))
+                for leaf in leaves}
+            leaves = sorted(leaves, key=keys.get, reverse=True)
+            for leaf in leaves[self.common_data.max_leaves:]:
+                leaf.remove()
+            leaves = leaves[:self.common_data.max_leaves]
+
+        total_weight = sum(leaf.weight for leaf in leaves)
+        for leaf in leaves:
+            leaf.weight /= total_weight
+
+    def is_depleted(self) -> bool:
+        """returns True if there are no leaves with real spawn left, it may happen only if leaves are resampled"""
+        return not self._root.next_states or not self.get_real_spawn_leaves()
+
+    def reseed_leaves(self):
+        """
+        makes all kept leaves real spawn ones, it is done when real spawn leaves are lost by resampling,
+        if no leaves are kept, tree is started again from its root with player at any position
+        """
+        if not self._root.next_states:
+            field_state = self._root.field_state
+            for grid_cell in field_state.field.get_cells():
+                if type(grid_cell) is UnknownCell:
+                    self._root.next_states.append(self._root.copy(player_position=(self.name, grid_cell.position)))
+            self._root.split_weight()
+        stack = list(self._root.next_states)
+        while stack:
+            node = stack.pop()
+            node.is_real_spawn = True
+            stack.extend(node.next_states)
+        self._leaf_index = LeafIndex(self._root)
+
+    def dedupe_leaves(self) -> tuple[dict[Node, Node], dict[Node, list[Node]]]:
+        """
+        joins leaves with the same field state in any branches of tree into the first of them,
+        weights and compatible nodes of removed leaves are added to the leaf left in tree
+
+        :return: removed nodes with the leaves which took their places,
+            and nodes left in tree which lost leaves of their subtrees with the leaves which took their places
+        """
+        replaced: dict[Node, Node] = {}
+        lost: dict[Node, list[Node]] = {}
+        transpositions = TranspositionTable()
+        for leaf in self.get_leaf_nodes():
+            same_leaf = transpositions.add(leaf)
+            if same_leaf is None:
+                continue
+            same_leaf.weight += leaf.weight
+            for player, compatible_nodes in leaf.compatible_with.items():
+                same_compatible_nodes = same_leaf.compatible_with.get(player)
+                if compatible_nodes is not None and same_compatible_nodes is not None:
+                    roots = set(same_compatible_nodes)
+                    same_leaf.compatible_with[player] = same_compatible_nodes + [
+                        node for node in compatible_nodes if not node.is_in_subtrees(roots)]
+            leaf.remove()
+            node = leaf
+            while node.get_parent() and node.is_deleted():
+                replaced[node] = same_leaf
+                node = node.get_parent()
+            # subtrees of ancestors of both leaves still have the leaf left in tree
+            while not same_leaf.is_in_subtrees({node}):
+                lost.setdefault(node, []).append(same_leaf)
+                node = node.get_parent()
+        return replaced, lost
+
+    def compact_tree(self) -> dict[Node, Node]:
+        """
+        splices out interior nodes which have the only next state, if it doesn't change leaves compatibility,
+        and releases field states and compatible nodes of interior nodes, only leaves use them
+
+        :return: spliced nodes with the nodes which took their places
+        """
+        replaced: dict[Node, Node] = {}
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            for i, next_node in enumerate(node.next_states):
+                spliced = []
+                while len(next_node.next_states) == 1 and next_node.is_splicable():
+                    spliced.append(next_node)
+                    next_node = next_node.next_states[0]
+                if spliced:
+                    node.next_states[i] = next_node
+                    next_node._set_parent(node)
+                    for spliced_node in spliced:
+                        replaced[spliced_node] = next_node
+                        spliced_node.release()
+                        spliced_node.next_states = []
+                if next_node.next_states:
+                    next_node.release()
+                    stack.append(next_node)
+        return replaced
+
     def get_leaf_nodes(self) -> list[Node]:
         """
         :return: list of all leaves of a tree
         """
-        leaves: list[Node] = []
-        self._collect_leaf_nodes(self._root, leaves)
-        return leaves
+        return list(self._leaf_index)
 
     def get_subtrees_leaf_nodes(self, roots: list[Node]) -> list[Node]:
         """
@@ -93,41 +230,24 @@ class PlayerState:
             if root.is_deleted():
                 roots.remove(root)
             else:
-                self._collect_leaf_nodes(root, leaves)
+                leaves += self._leaf_index.get_subtree_leaves(root)
         return leaves
 
+    def get_subtrees_positions(self, roots: list[Node]) -> set[Position]:
+        """
+        :return: positions of player in leaves of subtrees,
+            they are candidate positions of player for a leaf of other player compatible with the subtrees
+        """
+        return {leaf.field_state.get_player_pos(self.name) for leaf in self.get_subtrees_leaf_nodes(roots)}
+
     def get_real_spawn_leaves(self) -> list[Node]:
         """
         :return: list of only real-spawn leaves of a tree
         """
-        leaves: list[Node] = []
-        self._collect_real_spawn_nodes(self._root, leaves)
-        return leaves
+        return [leaf for leaf in self._leaf_index if leaf.is_path_real_spawn]
 
     def get_compatible_leaves(self, target_player: str) -> list[Node]:
         """
         :return: list of all leaves of a tree which compatible with target player
         """
-        leaves: list[Node] = []
-        self._collect_compatible_nodes(self._root, leaves, target_player)
-        return leaves
-
-    def _collect_leaf_nodes(self, root: Node, leaves: list[Node]):
-        if not root.next_states:
-            leaves.append(root)
-        for node in root.next_states:
-            self._collect_leaf_nodes(node, leaves)
-
-    def _collect_real_spawn_nodes(self, root: Node, leaves: list[Node]):
-        if not root.next_states:
-            leaves.append(root)
-        for node in root.next_states:
-            if node.is_real_spawn:
-                self._collect_real_spawn_nodes(node, leaves)
-
-    def _collect_compatible_nodes(self, root: Node, leaves: list[Node], target_player: str):
-        if not root.next_states:
-            leaves.append(root)
-        for node in root.next_states:
-            if node.enemy_compatibility[target_player]:
-                self._collect_compatible_nodes(node, leaves, target_player)
+        return [leaf for leaf in self._leaf_index if leaf.path_compatibility[target_player]]
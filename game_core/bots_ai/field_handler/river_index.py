@@ -0,0 +1,122 @@
+from functools import cache
+
+from ...game_engine.field import cell
+from ...game_engine.global_env.enums import Directions
+from .field_obj import UnknownCell
+
+SIDES = {direction: 1 << i for i, direction in enumerate(Directions)}
+# sides from which a river can flow into cell are kept in the high bits of the same number
+INPUT_SHIFT = len(SIDES)
+
+
+@cache
+def get_neighbours(cols: int, rows: int) -> list[list[tuple[Directions, int, int]]]:
+    """returns direction, index of neighbour and side of cell from which neighbour sees it, for each cell index"""
+    neighbours = []
+    for y in range(rows):
+        for x in range(cols):
+            cell_neighbours = []
+            for direction in Directions:
+                neighbour_x, neighbour_y = direction.get_neighbour_cords(x, y)
+                if 0 <= neighbour_x < cols and 0 <= neighbour_y < rows:
+                    cell_neighbours.append((direction, neighbour_y * cols + neighbour_x, SIDES[-direction]))
+            neighbours.append(cell_neighbours)
+    return neighbours
+
+
+class RiverIndex:
+    """
+    Known river topology of bot grid, it is updated on each change of a cell
+
+    For each cell it keeps sides from which a known river flows into it and sides from which a river
+    still can flow into it, that is a known river or an unknown cell.
+    River cells are linked into chains with union-find, the head of a chain is the first cell
+    downstream which is not a river, each cell also knows its distance to the head of its chain.
+
+    :param field: rows of cells
+    :type field: list[list[CELL]]
+    """
+    __slots__ = ('_cols', '_neighbours', '_sides', '_parents', '_distances')
+
+    def __init__(self, field: list[list]):
+        self._cols = len(field[0])
+        self._neighbours = get_neighbours(self._cols, len(field))
+        size = len(self._neighbours)
+        self._sides = [0] * size
+        self._parents = list(range(size))
+        self._distances = [0] * size
+        for y, row in enumerate(field):
+            for x, grid_cell in enumerate(row):
+                self._set_neighbours_sides(x, y, grid_cell)
+                if type(grid_cell) is cell.CellRiver:
+                    self._link(x, y, grid_cell.direction)
+
+    def copy(self) -> 'RiverIndex':
+        river_index = RiverIndex.__new__(RiverIndex)
+        river_index._cols, river_index._neighbours = self._cols, self._neighbours
+        river_index._sides = self._sides.copy()
+        river_index._parents = self._parents.copy()
+        river_index._distances = self._distances.copy()
+        return river_index
+
+    def update(self, field: list[list], x: int, y: int, old_cell, new_cell):
+        """
+        updates index after cell at (x, y) was changed
+
+        river cells are only added to bot grid, if a river is changed or removed chains are rebuilt
+        """
+        self._set_neighbours_sides(x, y, new_cell)
+        if type(old_cell) is cell.CellRiver:
+            self._parents = list(range(len(self._neighbours)))
+            self._distances = [0] * len(self._parents)
+            for row_y, row in enumerate(field):
+                for row_x, grid_cell in enumerate(row):
+                    if type(grid_cell) is cell.CellRiver:
+                        self._link(row_x, row_y, grid_cell.direction)
+        elif type(new_cell) is cell.CellRiver:
+            self._link(x, y, new_cell.direction)
+
+    def has_inflow(self, x: int, y: int, ignored_side: Directions = None) -> bool:
+        """returns True if a known river flows into cell from any side except ignored one"""
+        return bool(self._sides[y * self._cols + x] & ~SIDES.get(ignored_side, 0) & (1 << INPUT_SHIFT) - 1)
+
+    def has_input(self, x: int, y: int, ignored_side: Directions = None) -> bool:
+        """returns True if a river flows or still can flow into cell from any side except ignored one"""
+        return bool(self._sides[y * self._cols + x] >> INPUT_SHIFT & ~SIDES.get(ignored_side, 0))
+
+    def get_chain(self, x: int, y: int) -> tuple[int, int]:
+        """returns index of head of river chain of cell and distance from cell to it"""
+        return self._find(y * self._cols + x)
+
+    def _set_neighbours_sides(self, x: int, y: int, grid_cell):
+        river_direction = grid_cell.direction if type(grid_cell) is cell.CellRiver else None
+        is_unknown = type(grid_cell) is UnknownCell
+        sides = self._sides
+        for direction, neighbour, side in self._neighbours[y * self._cols + x]:
+            if river_direction is direction:
+                bits = side | side << INPUT_SHIFT
+            else:
+                bits = side << INPUT_SHIFT if is_unknown else 0
+            sides[neighbour] = sides[neighbour] & ~(side | side << INPUT_SHIFT) | bits
+
+    def _link(self, x: int, y: int, direction: Directions):
+        """links river cell, which is a head of its chain, to the next cell downstream"""
+        index = y * self._cols + x
+        for neighbour_direction, neighbour, _ in self._neighbours[index]:
+            if neighbour_direction is direction and self._find(neighbour)[0] != index:
+                self._parents[index] = neighbour
+                self._distances[index] = 1
+        # else river flows out of grid or is looped, cell stays the head
+
+    def _find(self, index: int) -> tuple[int, int]:
+        """returns head of chain and distance to it, path to the head is compressed"""
+        path = []
+        while self._parents[index] != index:
+            path.append(index)
+            index = self._parents[index]
+        head, distance = index, 0
+        for node in reversed(path):
+            distance += self._distances[node]
+            self._parents[node] = head
+            self._distances[node] = distance
+        return head, self._distances[path[0]] if path else 0
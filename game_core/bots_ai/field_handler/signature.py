@@ -0,0 +1,83 @@
+from ...game_engine.field import cell
+from ...game_engine.global_env.enums import Directions
+from .field_obj import UnknownCell
+
+# objects which are placed on field a limited number of times
+OBJECT_TYPES: list[type] = [cell.CellClinic, cell.CellArmory, cell.CellArmoryWeapon, cell.CellArmoryExplosive]
+OBJECT_INDEXES = {object_type: i for i, object_type in enumerate(OBJECT_TYPES)}
+RIVER_DIRECTIONS = list(Directions)
+RIVER_INDEXES = {direction: i for i, direction in enumerate(RIVER_DIRECTIONS)}
+
+
+class GridSignature:
+    """
+    Compact summary of bot grid knowledge, which is enough to prove most conflicts of two grids
+
+    Signature is immutable, so copies of grid share it, a change of a cell makes a new signature
+    in O(1), see `update`.
+    Bit `y * cols + x` of each bitboard stands for the cell at (x, y)
+
+    :ivar known: bitboard of cells which are not unknown
+    :type known: int
+    :ivar objects: bitboards of cells with unique objects, in order of `OBJECT_TYPES`
+    :type objects: tuple[int, ...]
+    :ivar rivers: bitboards of river cells by river direction, in order of `RIVER_DIRECTIONS`
+    :type rivers: tuple[int, ...]
+    """
+    __slots__ = ('known', 'objects', 'rivers', 'all_rivers')
+
+    def __init__(self, known: int, objects: tuple[int, ...], rivers: tuple[int, ...]):
+        self.known = known
+        self.objects = objects
+        self.rivers = rivers
+        self.all_rivers = 0
+        for bitboard in rivers:
+            self.all_rivers |= bitboard
+
+    @classmethod
+    def from_field(cls, field: list[list]) -> 'GridSignature':
+        known, objects, rivers = 0, [0] * len(OBJECT_TYPES), [0] * len(RIVER_DIRECTIONS)
+        bit = 1
+        for row in field:
+            for grid_cell in row:
+                cell_type = type(grid_cell)
+                if cell_type is not UnknownCell:
+                    known |= bit
+                    if cell_type in OBJECT_INDEXES:
+                        objects[OBJECT_INDEXES[cell_type]] |= bit
+                    elif cell_type is cell.CellRiver:
+                        rivers[RIVER_INDEXES[grid_cell.direction]] |= bit
+                bit <<= 1
+        return cls(known, tuple(objects), tuple(rivers))
+
+    def update(self, index: int, old_cell, new_cell) -> 'GridSignature':
+        """returns signature of grid in which cell at given index is changed"""
+        bit = 1 << index
+        known, objects, rivers = self.known, list(self.objects), list(self.rivers)
+        for grid_cell, is_added in [(old_cell, False), (new_cell, True)]:
+            cell_type = type(grid_cell)
+            if cell_type is UnknownCell:
+                continue
+            known = known | bit if is_added else known & ~bit
+            if cell_type in OBJECT_INDEXES:
+                i = OBJECT_INDEXES[cell_type]
+                objects[i] = objects[i] | bit if is_added else objects[i] & ~bit
+            elif cell_type is cell.CellRiver:
+                i = RIVER_INDEXES[grid_cell.direction]
+                rivers[i] = rivers[i] | bit if is_added else rivers[i] & ~bit
+        return GridSignature(known, tuple(objects), tuple(rivers))
+
+    def is_conflicting(self, other: 'GridSignature') -> bool:
+        """
+        returns True if grids can't be the same grid:
+        a river is known as another cell or river in other grid, or an object is known as another cell
+        """
+        if self.all_rivers & other.known & ~other.all_rivers or other.all_rivers & self.known & ~self.all_rivers:
+            return True
+        for rivers, other_rivers in zip(self.rivers, other.rivers):
+            if rivers & other.all_rivers & ~other_rivers:
+                return True
+        for objects, other_objects in zip(self.objects, other.objects):
+            if objects & other.known & ~other_objects or other_objects & self.known & ~objects:
+                return True
+        return False
@@ -1,6 +1,7 @@
 from ...game_engine.global_env.types import Position
 from ..exceptions import IncompatibleState
 from .field_state import FieldState
+from .leaf_index import LeafIndex
 
 
 class Node:
@@ -8,16 +9,30 @@ class Node:
                  enemy_compatibility: dict[str, bool],
                  compatible_with: dict[str, list['Node'] | None],
                  is_real_spawn: bool = False,
-                 parent: 'Node' = None):
+                 parent: 'Node' = None,
+                 weight: float = 1.0):
         self.field_state = field_state
         self.enemy_compatibility = enemy_compatibility
         self.compatible_with = compatible_with
         self.is_real_spawn = is_real_spawn
         self._parent: Node | None = parent
         self.next_states: list[Node] = []
+        self.weight = weight
+
+        # set by leaf index of the tree when node is added to it
+        self.leaf_index: LeafIndex | None = None
+        self.path_compatibility: dict[str, bool] | None = None
+        self.is_path_real_spawn: bool | None = None
 
         self.is_real = False  # todo debug only
 
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if 'weight' not in state:
+            # node pickled before nodes were weighted
+            self.weight = 1.0
+            self.leaf_index = self.path_compatibility = self.is_path_real_spawn = None
+
     def get_current_data(self):
         return self.field_state.get_current_data()
 
@@ -27,13 +42,16 @@ class Node:
             self.enemy_compatibility.copy(),
             {key: value.copy() if value else None for key, value in self.compatible_with.items()},
             is_real_spawn=self.is_real_spawn,
-            parent=self)
+            parent=self,
+            weight=self.weight)
 
     def remove(self):
         self._parent._remove_leaf(self)
 
     def update_compatibility(self, player_name: str, value: bool):
         self.enemy_compatibility[player_name] = value
+        if self.leaf_index:
+            self.leaf_index.update_compatibility(self, player_name)
 
     def check_compatibility(self) -> bool:
         if True not in self.enemy_compatibility.values() and not self.is_real_spawn:
@@ -44,11 +62,22 @@ class Node:
         for state in next_states:
             if state is not self:
                 state._set_parent(self)
-                self.next_states.append(state)
+                self._add_next_node(state)
+        self.split_weight()
 
     def add_next_state(self, field_state: FieldState):
         if field_state is not self.field_state:
-            self.next_states.append(self.copy(field_state=field_state))
+            self._add_next_node(self.copy(field_state=field_state))
+
+    def split_weight(self):
+        """shares weight of node between its next states evenly"""
+        for node in self.next_states:
+            node.weight = self.weight / len(self.next_states)
+
+    def _add_next_node(self, node: 'Node'):
+        self.next_states.append(node)
+        if self.leaf_index:
+            self.leaf_index.add_child(self, node)
 
     def merge_with(self, other_node: 'Node') -> 'Node':
         merged_node = self.copy()
@@ -56,12 +85,43 @@ class Node:
         return merged_node
 
     def _remove_leaf(self, leaf: 'Node'):
-        self.next_states.remove(leaf)
-        if not self.next_states and self._parent:
-            self._parent._remove_leaf(self)
+        # nodes left without next states are removed up the tree
+        node = self
+        while True:
+            node.next_states.remove(leaf)
+            if node.leaf_index:
+                node.leaf_index.remove_child(node, leaf)
+            if node.next_states or not node._parent:
+                return
+            node, leaf = node._parent, node
+
+    def is_splicable(self) -> bool:
+        """
+        :return: True if interior node may be replaced by its next state,
+            it is so if the node doesn't restrict compatibility of its subtree
+        """
+        return all(self.enemy_compatibility.values()) and \
+            (self.is_real_spawn or not self.next_states[0].is_real_spawn)
+
+    def release(self):
+        """releases data of interior node, only leaves use it"""
+        self.field_state = None
+        self.compatible_with = {}
+
+    def get_parent(self) -> 'Node | None':
+        return self._parent
 
     def _set_parent(self, parent: 'Node'):
         self._parent = parent
 
     def is_deleted(self) -> bool:
         return self not in self._parent.next_states
+
+    def is_in_subtrees(self, roots: set['Node']) -> bool:
+        """returns True if node or one of its ancestors is in roots"""
+        node = self
+        while node is not None:
+            if node in roots:
+                return True
+            node = node._parent
+        return False
@@ -0,0 +1,79 @@
+from functools import lru_cache
+from random import Random
+from typing import TYPE_CHECKING
+
+from ...game_engine.global_env.enums import Directions
+from ...game_engine.global_env.types import Position
+
+if TYPE_CHECKING:
+    from .tree_node import Node
+
+MASK = (1 << 64) - 1
+# keys of cells of a map of 30x30 cells are kept
+KEYS_CACHE_SIZE = 1 << 17
+
+
+@lru_cache(maxsize=KEYS_CACHE_SIZE)
+def get_key(*parts) -> int:
+    """returns random 64-bit key of parts, the key is the same in every process"""
+    return Random(repr(parts)).getrandbits(64)
+
+
+def get_cell_key(index: int, grid_cell) -> int:
+    """returns zobrist key of cell with its walls at given index of grid"""
+    return get_key(index, type(grid_cell), getattr(grid_cell, 'direction', None)) ^ \
+        get_walls_key(index, grid_cell.walls)
+
+
+def get_walls_key(index: int, walls: dict[Directions, object]) -> int:
+    key = 0
+    for direction, cell_wall in walls.items():
+        key ^= get_key(index, direction, type(cell_wall))
+    return key
+
+
+def get_player_key(player: str, position: Position | None) -> int:
+    return get_key(player, position.x, position.y) if position else 0
+
+
+def get_players_key(players_positions: dict[str, Position | None]) -> int:
+    key = 0
+    for player, position in players_positions.items():
+        key ^= get_player_key(player, position)
+    return key
+
+
+def get_treasure_key(position: Position) -> int:
+    return get_key('treasure', position.x, position.y)
+
+
+def get_treasures_key(treasures_positions: list[Position]) -> int:
+    """treasures keys are summed up, so positions with several treasures have different keys"""
+    key = 0
+    for position in treasures_positions:
+        key += get_treasure_key(position)
+    return key & MASK
+
+
+class TranspositionTable:
+    """
+    Leaves of a tree by zobrist hashes of their field states, it is used to find leaves with the same states
+
+    Leaves are the same only if they have the same real spawn and compatibility of their paths,
+    else joining them would change which enemies they are compatible with
+    """
+    def __init__(self):
+        self._leaves: dict[tuple, list['Node']] = {}
+
+    def add(self, leaf: 'Node') -> 'Node | None':
+        """
+
+        :param leaf: leaf to be added
+        :return: leaf with the same state which is already in table, None if leaf is added
+        """
+        key = (leaf.field_state.get_hash(), leaf.is_path_real_spawn, tuple(leaf.path_compatibility.values()))
+        same_key_leaves = self._leaves.setdefault(key, [])
+        for other_leaf in same_key_leaves:
+            if other_leaf.field_state.is_same(leaf.field_state):
+                return other_leaf
+        same_key_leaves.append(leaf)
@@ -40,7 +40,7 @@ class InitGenerator:
         )
         for position in self._spawn_points:
             next_state = root_state.copy(player_position=(player_name, position))
-            if position == self._players.get(player_name):
+            if position.get() == self._players.get(player_name).get():
                 next_state.is_real_spawn = True
             root_state.next_states.append(next_state)
         return root_state
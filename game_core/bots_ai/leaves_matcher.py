@@ -1,13 +1,21 @@
 from typing import Type
 
+import numpy as np
+
 from ..game_engine.field import cell
-from .field_handler.field_obj import UnknownCell, PossibleExit
-from .field_handler.field_state import CELL
+from ..game_engine.rules import get_bot_rules
+from .field_handler.bitboards import CELL_CODES, COMPATIBLE_CODES, RIVER_CODES, RIVER_DIRECTIONS
+from .field_handler.field_obj import UnknownCell
+from .field_handler.signature import OBJECT_INDEXES
 from .field_handler.player_state import PlayerState
 from .exceptions import MatchingError, MergingError
 from .field_handler.tree_node import Node
 
 MAX_MATCHABLE_NODES = 8
+MIN_BATCH_NODES = 4
+
+UNKNOWN_CODE = CELL_CODES[UnknownCell]
+RIVER_CODE = min(RIVER_CODES.values())
 
 
 class LeavesMatcher:
@@ -16,10 +24,30 @@ class LeavesMatcher:
                  players: dict[str, PlayerState],
                  game_rules: dict):
         self._unique_objs_amount = unique_objs_amount
+        self._set_unique_objs_keys()
         self._players = players
         self._set_init_compatible_nodes()
         self._size_x: int = game_rules.get('generator_rules').get('cols') + 2
         self._size_y: int = game_rules.get('generator_rules').get('rows') + 2
+        self._set_bot_rules(game_rules)
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        if '_unique_objs_codes' not in state:
+            # matcher pickled before bot rules were added, its game rules had none of them
+            self._set_unique_objs_keys()
+            self._set_bot_rules({})
+
+    def _set_bot_rules(self, game_rules: dict):
+        bot_rules = get_bot_rules(game_rules)
+        self._is_factorized_opponents: bool = bot_rules['factorized_opponents']
+
+    def _set_unique_objs_keys(self):
+        """sets amounts of unique objects by their cell codes and by their indexes in grid signatures"""
+        self._unique_objs_codes = {
+            CELL_CODES[obj_type]: amount for obj_type, amount in self._unique_objs_amount.items()}
+        self._unique_objs_indexes = {
+            OBJECT_INDEXES[obj_type]: amount for obj_type, amount in self._unique_objs_amount.items()}
 
     def _set_init_compatible_nodes(self):
         for player, state in self._players.items():
@@ -31,6 +59,23 @@ class LeavesMatcher:
                 for node in player_nodes:
                     node.compatible_with[other_player] = leaves
 
+    def reset_compatible_nodes(self, player_name: str):
+        """
+        makes leaves of player compatible with all leaves of other players and vice versa,
+        positions of players which are known in leaves are left as they are
+        """
+        leaves = self._players[player_name].get_leaf_nodes()
+        for other_player, state in self._players.items():
+            if other_player == player_name:
+                continue
+            other_leaves = state.get_leaf_nodes()
+            for node in leaves:
+                if not node.field_state.players_positions[other_player]:
+                    node.compatible_with[other_player] = other_leaves
+            for node in other_leaves:
+                if node.is_path_real_spawn and not node.field_state.players_positions[player_name]:
+                    node.compatible_with[player_name] = leaves
+
     def match_real_spawn_leaves(self, active_player: str):
         active_player_nodes = self._get_player_real_spawn_leaves(active_player)
         other_players = [player for player in self._players.keys() if player != active_player]
@@ -56,6 +101,8 @@ class LeavesMatcher:
 
     def _get_node_compatible_leaves(self, node: Node, other_player: str) -> list[Node]:
         compatible_roots = node.compatible_with[other_player]
+        if not compatible_roots:
+            raise MatchingError
         leaves = self._players.get(other_player).get_subtrees_leaf_nodes(compatible_roots)
         if not leaves:
             raise MatchingError
@@ -94,7 +141,9 @@ class LeavesMatcher:
 
         if not matchable_nodes:
             raise MatchingError
-        if len(matchable_nodes) > MAX_MATCHABLE_NODES:
+        # in factorized mode node is not split by positions of other player,
+        # matchable nodes are kept as its candidate positions and joined lazily, when node is matched next time
+        if len(matchable_nodes) > MAX_MATCHABLE_NODES or self._is_factorized_opponents and len(matchable_nodes) > 1:
             [other_node.update_compatibility(active_pl_name, True) for other_node in matchable_nodes]
             return [node]
 
@@ -114,70 +163,82 @@ class LeavesMatcher:
         node.set_next_states(merged_nodes)
         return merged_nodes
 
-    def _match_with_player(self, node: Node, other_nodes: list[Node]):
-        return [pl_node for pl_node in other_nodes if self._is_nodes_matchable(node, pl_node)]
+    def _match_with_player(self, node: Node, other_nodes: list[Node]) -> list[Node]:
+        other_nodes = [pl_node for pl_node in other_nodes
+                       if self._is_players_matchable(node, pl_node) and self._is_signatures_matchable(node, pl_node)]
+        if len(other_nodes) < MIN_BATCH_NODES:
+            return [pl_node for pl_node in other_nodes if self._is_grids_matchable(node, pl_node)]
+        return self._match_batch(node, other_nodes)
+
+    def _match_batch(self, node: Node, other_nodes: list[Node]) -> list[Node]:
+        """
+        matches grid of node with grids of all other nodes at once, cells are compared as stacked cell codes
+
+        :param node: node to be matched
+        :param other_nodes: nodes of other player, their players positions must be matchable with node
+        :return: list of matchable nodes
+        """
+        field = node.field_state.field
+        codes = field.get_bitboards().get_codes()
+        other_codes = np.stack([pl_node.field_state.field.get_bitboards().get_codes() for pl_node in other_nodes])
+
+        is_matchable = COMPATIBLE_CODES[codes, other_codes].all(axis=1)
+        for code, amount in self._unique_objs_codes.items():
+            is_matchable &= np.count_nonzero((other_codes == code) | (codes == code), axis=1) <= amount
+
+        # unknown cell may be a river only if river direction is available in its grid
+        is_unknown, other_is_unknown = codes == UNKNOWN_CODE, other_codes == UNKNOWN_CODE
+        is_river, other_is_river = codes >= RIVER_CODE, other_codes >= RIVER_CODE
+        cols = field.get_bitboards().cols
+        for node_idx, cell_idx in zip(*np.nonzero((is_unknown & other_is_river | other_is_unknown & is_river) &
+                                                  is_matchable[:, None])):
+            if not is_matchable[node_idx]:
+                continue
+            y, x = divmod(int(cell_idx), cols)
+            if is_unknown[cell_idx]:
+                direction = RIVER_DIRECTIONS[other_codes[node_idx, cell_idx] - RIVER_CODE]
+                is_matchable[node_idx] = field.is_river_direction_available_at(x, y, direction)
+            else:
+                direction = RIVER_DIRECTIONS[codes[cell_idx] - RIVER_CODE]
+                other_field = other_nodes[node_idx].field_state.field
+                is_matchable[node_idx] = other_field.is_river_direction_available_at(x, y, direction)
+        return [pl_node for pl_node, is_node_matchable in zip(other_nodes, is_matchable) if is_node_matchable]
 
-    def _is_nodes_matchable(self, node: Node, other_node: Node):
+    @staticmethod
+    def _is_players_matchable(node: Node, other_node: Node) -> bool:
         for player, position in node.field_state.players_positions.items():
             other_node_player_pos = other_node.field_state.players_positions[player]
             if position and other_node_player_pos and position != other_node_player_pos:
                 return False
+        return True
 
-        unique_objs = self._unique_objs_amount.copy()
-        for node_row, other_node_row in zip(node.field_state.field.get_field(),
-                                            other_node.field_state.field.get_field()):
-            for self_cell, other_cell in zip(node_row, other_node_row):
-                if not self._is_cells_matchable(node, other_node, self_cell, other_cell, unique_objs):
-                    return False
+    def _is_signatures_matchable(self, node: Node, other_node: Node) -> bool:
+        """cheap check of grids, it rejects most of not matchable grids before they are compared cell by cell"""
+        signature = node.field_state.field.get_signature()
+        other_signature = other_node.field_state.field.get_signature()
+        if signature.is_conflicting(other_signature):
+            return False
+        for object_index, amount in self._unique_objs_indexes.items():
+            if (signature.objects[object_index] | other_signature.objects[object_index]).bit_count() > amount:
+                return False
         return True
 
-    @staticmethod
-    def _is_cells_matchable(node: Node, other_node: Node,
-                            self_cell, other_cell, unique_objs: dict[Type[CELL], int]):
-        self_type = type(self_cell)
-        other_type = type(other_cell)
-
-        if self_type is cell.NoneCell and other_type in [cell.NoneCell, PossibleExit]:
-            return True
-        if self_type is cell.CellExit and other_type in [cell.CellExit, PossibleExit]:
-            return True
-        if self_type is PossibleExit and other_type in [cell.CellExit, cell.NoneCell, PossibleExit]:
-            return True
-        if self_type is UnknownCell:
-            if other_type is UnknownCell:
-                return True
-            if other_type in unique_objs:
-                if unique_objs.get(other_type) > 0:
-                    unique_objs[other_type] -= 1
-                else:
-                    return False
-            if other_type is cell.CellRiver:
-                if not node.field_state.field.is_river_direction_available(self_cell, other_cell.direction,
-                                                                           no_raise=True):
-                    return False
-            return True
-
-        if other_type is UnknownCell:
-            if self_type in unique_objs:
-                if unique_objs.get(self_type) > 0:
-                    unique_objs[self_type] -= 1
-                else:
-                    return False
-            if self_type is cell.CellRiver:
-                if not other_node.field_state.field.is_river_direction_available(other_cell, self_cell.direction,
-                                                                                 no_raise=True):
-                    return False
-            return True
-
-        if self_type is other_type:
-            if self_type in unique_objs:
-                if unique_objs.get(self_type) > 0:
-                    unique_objs[self_type] -= 1
-                else:
-                    return False
-            if other_type is cell.CellRiver:
-                if other_cell.direction is not self_cell.direction:
-                    return False
-            return True
-
-        return False
+    def _is_grids_matchable(self, node: Node, other_node: Node) -> bool:
+        field, other_field = node.field_state.field, other_node.field_state.field
+        bitboards, other_bitboards = field.get_bitboards(), other_field.get_bitboards()
+        if bitboards.get_conflicts(other_bitboards):
+            return False
+        for obj_type, amount in self._unique_objs_amount.items():
+            if (bitboards.get_cells(obj_type) | other_bitboards.get_cells(obj_type)).bit_count() > amount:
+                return False
+        # unknown cell may be a river only if river direction is available in its grid
+        rivers, other_rivers = bitboards.get_cells(cell.CellRiver), other_bitboards.get_cells(cell.CellRiver)
+        for x, y in bitboards.iter_coords(bitboards.get_cells(UnknownCell) & other_rivers):
+            direction = other_field.get_cell_by_coords(x, y).direction
+            if not field.is_river_direction_available_at(x, y, direction):
+                return False
+        for x, y in bitboards.iter_coords(other_bitboards.get_cells(UnknownCell) & rivers):
+            direction = field.get_cell_by_coords(x, y).direction
+            if not other_field.is_river_direction_available_at(x, y, direction):
+                return False
+        return True
@@ -0,0 +1,291 @@
+import multiprocessing
+import pickle
+import weakref
+from io import BytesIO
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+
+from ..game_engine.global_env.enums import Directions, Actions
+from .exceptions import UnreachableState, IncompatibleState, MergingError
+from .field_handler.common_data import CommonData
+from .field_handler.field_state import FieldState
+from .field_handler.grid import CELL
+from .field_handler.player_state import PlayerState
+from .field_handler.tree_node import Node
+
+# states refer to common data of bot, worker keeps its own copy of it
+_COMMON_DATA_ID = 'common_data'
+
+# state which worker has: key of state in worker, index of worker and rows of state when it was synced
+SYNCED_STATE = tuple[FieldState, int, int, list[list[CELL]]]
+# state sent to worker: key, key of base state or None, changes of state or the whole new state, True if processed
+STATE_ENTRY = tuple[int, int | None, tuple | FieldState, bool]
+
+
+class _StatesPickler(pickle.Pickler):
+    def __init__(self, file: BytesIO, common_data: CommonData):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._common_data = common_data
+
+    def persistent_id(self, obj):
+        return _COMMON_DATA_ID if obj is self._common_data else None
+
+
+class _StatesUnpickler(pickle.Unpickler):
+    def __init__(self, file: BytesIO, common_data: CommonData):
+        super().__init__(file)
+        self._common_data = common_data
+
+    def persistent_load(self, pid):
+        if pid != _COMMON_DATA_ID:
+            raise pickle.UnpicklingError(f'unknown persistent id {pid}')
+        return self._common_data
+
+
+def _serve(connection: Connection):
+    """
+    runs in worker process, keeps states sent to worker by their keys and processes turn in them,
+    states which are not sent on a turn are dropped, as they are not leaves any more
+    """
+    common_data = CommonData.__new__(CommonData)
+    states: dict[int, FieldState] = {}
+    # keys of next states made by worker are negative, main process gives positive keys to states it sends
+    last_key = 0
+    while True:
+        try:
+            data = connection.recv_bytes()
+        except EOFError:
+            return
+        common_data_vars, entries, turn = _StatesUnpickler(BytesIO(data), common_data).load()
+        common_data.__dict__.update(common_data_vars)
+
+        # new states are made of their base states as they were synced, before base states are changed
+        kept: dict[int, FieldState] = {}
+        for key, base, payload, _ in entries:
+            if isinstance(payload, FieldState):
+                kept[key] = payload
+            elif base is not None:
+                kept[key] = (kept[base] if base in kept else states[base]).copy()
+                kept[key].apply_changes(payload)
+        for key, base, payload, _ in entries:
+            if key not in kept:
+                kept[key] = states[key]
+                kept[key].apply_changes(payload)
+
+        results = []
+        for key, _, _, is_processed in entries:
+            if not is_processed:
+                continue
+            state = kept[key]
+            rows = state.field.share_rows()
+            try:
+                next_states = state.process_action(*turn)
+            except (UnreachableState, IncompatibleState, MergingError):
+                del kept[key]
+                results.append(None)
+                continue
+            next_states_changes = []
+            for next_state in next_states:
+                if next_state is state:
+                    next_states_changes.append(None)
+                    continue
+                last_key -= 1
+                kept[last_key] = next_state
+                next_states_changes.append((last_key, next_state.get_changes(rows)))
+            results.append((state.get_changes(rows), next_states_changes))
+        states = kept
+        connection.send(results)
+
+
+def _stop_workers(workers: list[tuple[BaseProcess, Connection]]):
+    for process, connection in workers:
+        connection.close()
+    for process, connection in workers:
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+
+
+def is_available() -> bool:
+    """returns True if workers can be forked on this platform"""
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+
+class ParallelTurnProcessor:
+    """
+    Processes turn in trees of players at the same time in long-lived worker processes
+
+    Workers are forked on the first turn processed by them and keep copies of leaf states,
+    each tree is kept by one worker, or its leaves are spread between workers if leaves are split.
+    On each turn the main process sends to workers only changes which leaf states got since they were synced,
+    new leaves are sent as changes of their nearest synced ancestors,
+    and workers send back changes of leaves and of their next states, see `FieldState.get_changes`.
+    Trees themselves stay in the main process, as leaves matcher links nodes of different trees to each other.
+    Workers are not pickled, they are forked again after processor is loaded.
+
+    :param players: states of players
+    :type players: dict[str, PlayerState]
+    :param processes: max number of worker processes
+    :type processes: int
+    :param min_leaves: turn is processed in the main process if trees have fewer leaves in total
+    :type min_leaves: int
+    :param is_split_leaves: if True leaves of a tree are spread between workers,
+        else each tree is processed by one worker
+    :type is_split_leaves: bool
+    """
+    def __init__(self, players: dict[str, PlayerState], processes: int,
+                 min_leaves: int = 0, is_split_leaves: bool = False):
+        self._players = players
+        self._processes = processes
+        self._min_leaves = min_leaves
+        self._is_split_leaves = is_split_leaves
+        self._workers: list[tuple[BaseProcess, Connection]] = []
+        self._finalizer: weakref.finalize | None = None
+        self._synced: dict[int, SYNCED_STATE] = {}
+        self._last_key = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_workers'] = []
+        state['_finalizer'] = None
+        state['_synced'] = {}
+        return state
+
+    def process_turn(self, player_name: str, action: Actions, direction: Directions | None, response: dict):
+        leaves = {tree_owner: player_state.get_leaf_nodes()[::-1] for tree_owner, player_state in self._players.items()}
+        if sum(len(tree_leaves) for tree_leaves in leaves.values()) < self._min_leaves:
+            for player_state in self._players.values():
+                player_state.process_turn(player_name, action, direction, response)
+            return
+
+        if not self._workers:
+            self._start_workers()
+        try:
+            leaves_next_states = self._process_in_workers(leaves, (player_name, action, direction, response))
+        except (EOFError, OSError):
+            # worker is lost, workers are started again on the next turn
+            self.close()
+            for player_state in self._players.values():
+                player_state.process_turn(player_name, action, direction, response)
+            return
+        for tree_owner, player_state in self._players.items():
+            player_state.process_turn(player_name, action, direction, response, leaves_next_states[tree_owner])
+
+    def close(self):
+        """stops workers, states are sent to new workers as a whole"""
+        if self._finalizer is not None:
+            self._finalizer()
+        self._workers = []
+        self._finalizer = None
+        self._synced = {}
+
+    def _start_workers(self):
+        context = multiprocessing.get_context('fork')
+        amount = self._processes if self._is_split_leaves else min(self._processes, len(self._players))
+        for _ in range(amount):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(target=_serve, args=(worker_connection,), daemon=True)
+            process.start()
+            worker_connection.close()
+            self._workers.append((process, connection))
+        self._finalizer = weakref.finalize(self, _stop_workers, self._workers)
+
+    def _process_in_workers(self, leaves: dict[str, list[Node]],
+                            turn: tuple) -> dict[str, list[list[FieldState] | None]]:
+        """
+        sends changes of leaves to workers and makes next states of leaves of their results
+
+        :return: next states of leaves of each tree in reversed order, None for removed leaves
+        """
+        workers_entries: list[list[STATE_ENTRY]] = [[] for _ in self._workers]
+        synced: dict[int, SYNCED_STATE] = {}
+        sent: dict[str, list[tuple[int, int] | None]] = {}
+        for tree_idx, (tree_owner, tree_leaves) in enumerate(leaves.items()):
+            sent[tree_owner] = []
+            for leaf in tree_leaves:
+                try:
+                    leaf.check_compatibility()
+                except IncompatibleState:
+                    sent[tree_owner].append(None)
+                    continue
+                default_worker = tree_idx % len(self._workers) if not self._is_split_leaves else \
+                    min(range(len(self._workers)), key=lambda idx: len(workers_entries[idx]))
+                sent[tree_owner].append(self._add_entry(leaf, default_worker, workers_entries, synced))
+
+        common_data = next(iter(self._players.values())).common_data
+        for (_, connection), entries in zip(self._workers, workers_entries):
+            data = BytesIO()
+            _StatesPickler(data, common_data).dump((vars(common_data), entries, turn))
+            connection.send_bytes(data.getbuffer())
+        workers_results = [iter(connection.recv()) for _, connection in self._workers]
+
+        leaves_next_states: dict[str, list[list[FieldState] | None]] = {}
+        for tree_owner, tree_leaves in leaves.items():
+            leaves_next_states[tree_owner] = []
+            for leaf, sent_leaf in zip(tree_leaves, sent[tree_owner]):
+                result = next(workers_results[sent_leaf[1]]) if sent_leaf else None
+                if result is None:
+                    synced.pop(id(leaf.field_state), None)
+                    leaves_next_states[tree_owner].append(None)
+                    continue
+                state_changes, next_states_changes = result
+                state = leaf.field_state
+                next_states = []
+                for next_state_changes in next_states_changes:
+                    if next_state_changes is None:
+                        next_states.append(state)
+                        continue
+                    next_key, changes = next_state_changes
+                    next_state = state.copy()
+                    next_state.apply_changes(changes)
+                    next_states.append(next_state)
+                    synced[id(next_state)] = (next_state, next_key, sent_leaf[1], [])
+                state.apply_changes(state_changes)
+                leaves_next_states[tree_owner].append(next_states)
+
+        for state_id, (state, key, worker_idx, rows) in synced.items():
+            if not rows:
+                synced[state_id] = (state, key, worker_idx, state.field.share_rows())
+        self._synced = synced
+        return leaves_next_states
+
+    def _add_entry(self, leaf: Node, default_worker: int, workers_entries: list[list[STATE_ENTRY]],
+                   synced: dict[int, SYNCED_STATE]) -> tuple[int, int]:
+        """
+        adds entry of leaf state to entries of worker which has the state or its base,
+        state is sent as changes since it was synced, or as changes of the nearest synced ancestor state,
+        the root state of tree is sent as a whole if no ancestor is synced
+
+        :return: key of state and index of worker
+        """
+        state = leaf.field_state
+        record = self._synced.get(id(state))
+        if record and record[0] is state:
+            _, key, worker_idx, rows = record
+            workers_entries[worker_idx].append((key, None, state.get_changes(rows), True))
+            # rows are shared again when results are applied
+            synced[id(state)] = (state, key, worker_idx, [])
+            return key, worker_idx
+
+        node, base_record = leaf.get_parent(), None
+        while node is not None:
+            if node.field_state is not None:
+                base_record = self._synced.get(id(node.field_state)) or synced.get(id(node.field_state))
+                if base_record and base_record[0] is node.field_state and base_record[3]:
+                    break
+                base_record = None
+            if node.get_parent() is None:
+                break
+            node = node.get_parent()
+        if base_record is None:
+            # node is root of the tree now, its state is never changed
+            self._last_key += 1
+            base_record = (node.field_state, self._last_key, default_worker, node.field_state.field.share_rows())
+            workers_entries[default_worker].append((self._last_key, None, node.field_state, False))
+            synced[id(node.field_state)] = base_record
+
+        base_state, base_key, worker_idx, base_rows = base_record
+        self._last_key += 1
+        workers_entries[worker_idx].append((self._last_key, base_key, state.get_changes(base_rows), True))
+        synced[id(state)] = (state, self._last_key, worker_idx, [])
+        return self._last_key, worker_idx
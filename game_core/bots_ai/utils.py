@@ -32,8 +32,7 @@ def is_node_is_real(
                     else:
                         return False
                 if type(target_cell) is cell.CellRiver:
-                    idx = real_cell.river.index(real_cell)
-                    if target_cell.direction is not (real_cell - real_cell.river[idx + 1]):
+                    if target_cell.direction is not (real_cell - real_cell.next_cell):
                         return False
                 continue
             else:
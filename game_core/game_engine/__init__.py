@@ -1,4 +1,4 @@
 from .game import Game
 from .global_env.enums import Actions, Directions
 from .global_env.types import Position, LevelPosition
-from .rules import get_rules
+from .rules import get_rules, get_bot_rules
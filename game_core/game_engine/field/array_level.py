@@ -0,0 +1,188 @@
+from collections.abc import MutableMapping
+from weakref import WeakValueDictionary
+
+import numpy as np
+
+from . import cell as c, wall as w
+from .game_level import GameLevel
+from .line_of_sight import LineOfSight
+from ..global_env.enums import Directions
+from ..global_env.types import LevelPosition, Position
+
+CELL_TYPES: list[type[c.CELL]] = [
+    c.NoneCell, c.Cell,
+    c.CellRiver, c.CellRiverMouth, c.CellRiverBridge,
+    c.CellExit, c.CellClinic, c.CellArmory,
+    c.CellArmoryWeapon, c.CellArmoryExplosive,
+]
+WALL_TYPES: list[type[w.WALL]] = [
+    w.WallEmpty, w.WallConcrete, w.WallOuter, w.WallExit, w.WallEntrance, w.WallRubber,
+]
+
+_CELL_CODES = {cell_type: code for code, cell_type in enumerate(CELL_TYPES)}
+_WALL_CODES = {wall_type: code for code, wall_type in enumerate(WALL_TYPES)}
+_WALLS = [wall_type() for wall_type in WALL_TYPES]
+
+
+class LevelWalls(MutableMapping):
+    """
+    Walls of a cell view, read from and written to the wall plane of ArrayGameLevel
+
+    Returned walls are shared between all cells, they must not be modified
+    """
+
+    __slots__ = '_level', '_x', '_y'
+
+    def __init__(self, level: 'ArrayGameLevel', x: int, y: int):
+        self._level = level
+        self._x = x
+        self._y = y
+
+    def __getitem__(self, direction: Directions) -> w.WALL:
+        return _WALLS[self._level.walls.item(self._y, self._x, direction.value - 1)]
+
+    def __setitem__(self, direction: Directions, wall: w.WALL):
+        self._level.walls[self._y, self._x, direction.value - 1] = _WALL_CODES[type(wall)]
+
+    def __delitem__(self, direction: Directions):
+        raise TypeError('cell walls can not be deleted')
+
+    def __iter__(self):
+        return iter(Directions)
+
+    def __len__(self):
+        return len(Directions)
+
+    def copy(self) -> dict[Directions, w.WALL]:
+        return dict(self.items())
+
+    def reduce_cell(self):
+        """cell views are pickled and copied as a reference to the cell of the level"""
+        return _get_cell_view, (self._level, self._x, self._y)
+
+
+def _get_cell_view(level: 'ArrayGameLevel', x: int, y: int) -> c.CELL:
+    return level.get_cell_by_coords(x, y)
+
+
+class ArrayGameLevel(GameLevel):
+    """
+    Game level which keeps cells in NumPy planes instead of cell objects
+
+    Cells are returned as views: objects of usual cell classes,
+    whose walls are read from the planes of the level.
+    Views are cached while they are referenced, so the same cell is the same object.
+    Views of river cells are created and linked by whole rivers and kept while the river is unchanged.
+
+    :ivar cell_types: cell type codes (index in CELL_TYPES)
+    :type cell_types: np.ndarray[np.int8]
+    :ivar walls: wall type codes (index in WALL_TYPES) of each side of cell
+    :type walls: np.ndarray[np.uint8]
+    :ivar rivers: coords of cells of each river in order of flow
+    :type rivers: list[list[tuple[int, int]]]
+    :ivar river_cells: river id, index in river and direction of each river cell by its coords
+    :type river_cells: dict[tuple[int, int], tuple[int, int, Directions | None]]
+    """
+
+    def __init__(self, level_position: LevelPosition, rows: int, cols: int):
+        self.level_position: LevelPosition = level_position
+        self.cell_types: np.ndarray = np.zeros((rows, cols), dtype=np.int8)
+        self.walls: np.ndarray = np.zeros((rows, cols, len(Directions)), dtype=np.uint8)
+        self.rivers: list[list[tuple[int, int]]] = []
+        self.river_cells: dict[tuple[int, int], tuple[int, int, Directions | None]] = {}
+        self._views: WeakValueDictionary[tuple[int, int], c.CELL] = WeakValueDictionary()
+        self._river_views: dict[int, list[c.CellRiver]] = {}
+        self._transitions: dict[tuple[Position, Directions], tuple[c.CELL, c.CELL, type[w.WALL]]] = {}
+        self.line_of_sight = LineOfSight(self)
+
+    @classmethod
+    def from_level(cls, level: GameLevel) -> 'ArrayGameLevel':
+        """creates array-backed copy of a level"""
+        array_level = cls(level.level_position, len(level.field), len(level.field[0]))
+        for row in level.field:
+            for cell in row:
+                array_level.set_cell(cell.position, cell)
+        return array_level
+
+    @property
+    def field(self) -> list[list[c.CELL]]:
+        rows, cols = self.cell_types.shape
+        return [[self.get_cell_by_coords(x, y) for x in range(cols)] for y in range(rows)]
+
+    def get_neighbour_cell(self, position: Position, direction: Directions) -> c.CELL | None:
+        x, y = direction.get_neighbour_cords(position.x, position.y)
+        rows, cols = self.cell_types.shape
+        if not (-rows <= y < rows and -cols <= x < cols):
+            return None
+        return self.get_cell_by_coords(x % cols, y % rows)
+
+    def set_cell(self, position: Position, new_cell: c.CELL):
+        self._transitions.clear()
+        self.line_of_sight.invalidate()
+        x, y = position.x, position.y
+        self.cell_types[y, x] = _CELL_CODES[type(new_cell)]
+        for direction, wall in new_cell.walls.items():
+            self.walls[y, x, direction.value - 1] = _WALL_CODES[type(wall)]
+        if isinstance(new_cell, c.CellRiver):
+            if (x, y) not in self.river_cells:
+                self._add_river([river_cell.position.get() for river_cell in new_cell.river])
+            river_id, idx, _ = self.river_cells[x, y]
+            self.river_cells[x, y] = river_id, idx, new_cell.direction
+            for coords in self.rivers[river_id]:
+                self._views.pop(coords, None)
+            self._river_views.pop(river_id, None)
+        self._views.pop((x, y), None)
+
+    def get_cell(self, position: Position) -> c.CELL:
+        return self.get_cell_by_coords(position.x, position.y)
+
+    def get_cell_by_coords(self, x: int, y: int) -> c.CELL:
+        try:
+            return self._views[x, y]
+        except KeyError:
+            pass
+        if (x, y) in self.river_cells:
+            river_id, idx, _ = self.river_cells[x, y]
+            return self._get_river_views(river_id)[idx]
+        view = self._create_view(x, y)
+        self._views[x, y] = view
+        return view
+
+    def _create_view(self, x: int, y: int) -> c.CELL:
+        cell_type = CELL_TYPES[self.cell_types.item(y, x)]
+        view = cell_type.__new__(cell_type)
+        view.position = Position(x, y, self.level_position)
+        view.walls = LevelWalls(self, x, y)
+        return view
+
+    def _get_river_views(self, river_id: int) -> list[c.CellRiver]:
+        try:
+            return self._river_views[river_id]
+        except KeyError:
+            pass
+        river = []
+        for x, y in self.rivers[river_id]:
+            view = self._create_view(x, y)
+            view.direction = self.river_cells[x, y][2]
+            self._views[x, y] = view
+            river.append(view)
+        c.CellRiver.link_river(river, river_id)
+        self._river_views[river_id] = river
+        return river
+
+    def _add_river(self, river: list[tuple[int, int]]):
+        river_id = len(self.rivers)
+        self.rivers.append(river)
+        for idx, coords in enumerate(river):
+            self.river_cells[coords] = river_id, idx, None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        del state['_views']
+        del state['_river_views']
+        return state
+
+    def __setstate__(self, state: dict):
+        super().__setstate__(state)
+        self._views = WeakValueDictionary()
+        self._river_views = {}
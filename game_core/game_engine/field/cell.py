@@ -59,6 +59,12 @@ class NoneCell:
             return None
         return self.position - other.position
 
+    def __reduce_ex__(self, protocol):
+        reduce_cell = getattr(self.walls, 'reduce_cell', None)
+        if reduce_cell is not None:
+            return reduce_cell()
+        return super().__reduce_ex__(protocol)
+
     def __repr__(self):
         return '='
 
@@ -82,46 +88,68 @@ class Cell(NoneCell):
 
 
 class CellRiver(Cell):
-    """River cell object"""
+    """
+    River cell object
+
+    :ivar river: cells of the river in order of flow
+    :type river: list[CellRiver]
+    :ivar river_id: id of the river on its level
+    :type river_id: int | None
+    :ivar river_idx: index of the cell in the river
+    :type river_idx: int | None
+    :ivar next_cell: next cell of the river, None for the mouth
+    :type next_cell: CellRiver | None
+    :ivar next_next_cell: cell two steps down the river, the mouth if it is closer
+    :type next_next_cell: CellRiver | None
+    """
     def __init__(self, position: Position, direction: Directions = None):
         super().__init__(position)
         self.river = []
         self.direction = direction
+        self.river_id: int | None = None
+        self.river_idx: int | None = None
+        self.next_cell: CellRiver | None = None
+        self.next_next_cell: CellRiver | None = None
 
     def idle(self, previous_cell):
-        idx = self.river.index(self)
-        return self.river[idx + 1]
+        return self.next_cell
 
     def active(self, previous_cell):
         if self._is_same_river(previous_cell):
             return self
         else:
-            idx = self.river.index(self)
-            dif = len(self.river) - 1 - idx
-            return self.river[idx + 2] if dif > 2 else self.river[idx + dif]
+            return self.next_next_cell
 
     def treasure_movement(self):
-        index = self.river.index(self)
-        return self.river[index + 1]
+        return self.next_cell
 
     def _is_same_river(self, previous_cell):
-        if isinstance(previous_cell, CellRiver) and previous_cell is not self:
-            if previous_cell in self.river:
-                if abs(self.river.index(self) - self.river.index(previous_cell)) == 1:
+        if isinstance(previous_cell, CellRiver) and previous_cell.river_id is not None:
+            if previous_cell.river_id == self.river_id and \
+                    previous_cell.position.level_position is self.position.level_position:
+                if abs(self.river_idx - previous_cell.river_idx) == 1:
                     return True
 
-    def add_river_list(self, river):
-        self.river = river
+    @staticmethod
+    def link_river(river: list['CellRiver'], river_id: int):
+        """sets river to each of its cells and precomputes their places in the river"""
+        last_idx = len(river) - 1
+        for idx, river_cell in enumerate(river):
+            river_cell.river = river
+            river_cell.river_id = river_id
+            river_cell.river_idx = idx
+            if idx < last_idx:
+                river_cell.next_cell = river[idx + 1]
+                river_cell.next_next_cell = river[min(idx + 2, last_idx)]
+            else:
+                river_cell.next_cell = river_cell.next_next_cell = None
 
     def to_dict(self):
         sup = super().to_dict()
-        idx = self.river.index(self)
-        try:
-            next_river_cell = self.river[idx + 1]
-        except IndexError:
+        if self.next_cell is None:
             direction = 'mouth'
         else:
-            direction = (self - next_river_cell).name
+            direction = (self - self.next_cell).name
 
         riv_dict = {'river_dir': direction}
         sup |= riv_dict
@@ -1,6 +1,8 @@
+from bisect import insort
+from copy import copy, deepcopy
 from functools import partial
 from operator import attrgetter
-from random import choice, sample
+from random import Random
 
 from .game_map import GameMap
 from ..field_generator.map_generator import MapGenerator
@@ -9,7 +11,83 @@ from ..entities.player import Player
 from ..entities.treasure import Treasure
 from ..global_env.enums import Actions, Directions
 from ..bot_names import bots as data_bots
-from ..global_env.types import Position, LevelPosition
+from ..global_env.types import Position, LevelPosition, get_interned
+
+
+BROKEN_WALL = tuple[Position, Directions, w.WALL, w.WALL | None]
+
+
+class FieldSnapshot:
+    """
+    Copy of mutable state of Field
+
+    :ivar players: copies of players
+    :type players: list[Player]
+    :ivar treasures: copies of treasures dropped on field
+    :type treasures: list[Treasure]
+    :ivar treasures_order: order numbers of treasures
+    :type treasures_order: list[int]
+    :ivar next_treasure_order: order number of the next dropped treasure
+    :type next_treasure_order: int
+    :ivar active_player_idx: index of active player
+    :type active_player_idx: int
+    :ivar is_host_turn: describe is host turn after current turn
+    :type is_host_turn: bool
+    :ivar broken_walls: walls broken since map generation
+    :type broken_walls: tuple[BROKEN_WALL, ...]
+    """
+
+    __slots__ = ('players', 'treasures', 'treasures_order', 'next_treasure_order',
+                 'active_player_idx', 'is_host_turn', 'broken_walls')
+
+    def __init__(self, players: list[Player], treasures: list[Treasure], treasures_order: list[int],
+                 next_treasure_order: int, active_player_idx: int, is_host_turn: bool,
+                 broken_walls: tuple[BROKEN_WALL, ...]):
+        self.players = players
+        self.treasures = treasures
+        self.treasures_order = treasures_order
+        self.next_treasure_order = next_treasure_order
+        self.active_player_idx = active_player_idx
+        self.is_host_turn = is_host_turn
+        self.broken_walls = broken_walls
+
+
+class TurnDelta:
+    """
+    Changes made by a turn, states are pairs of values before and after the turn
+
+    :ivar players: states of changed players
+    :type players: list[tuple[Player, tuple, tuple]]
+    :ivar treasures: states of changed treasures: position and order number, if treasure is on field
+    :type treasures: list[tuple[Treasure, tuple[Position | None, int | None], tuple[Position | None, int | None]]]
+    :ivar next_treasure_order: order numbers of the next dropped treasure
+    :type next_treasure_order: tuple[int, int]
+    :ivar broken_walls: walls broken by the turn
+    :type broken_walls: tuple[BROKEN_WALL, ...]
+    :ivar active_player_idx: indexes of active player
+    :type active_player_idx: tuple[int, int]
+    :ivar is_host_turn: host turn flags
+    :type is_host_turn: tuple[bool, bool]
+    """
+
+    __slots__ = 'players', 'treasures', 'next_treasure_order', 'broken_walls', 'active_player_idx', 'is_host_turn'
+
+    def __init__(self, players: list[tuple[Player, tuple, tuple]],
+                 treasures: list[tuple[Treasure, tuple, tuple]],
+                 next_treasure_order: tuple[int, int],
+                 broken_walls: tuple[BROKEN_WALL, ...],
+                 active_player_idx: tuple[int, int],
+                 is_host_turn: tuple[bool, bool]):
+        self.players = players
+        self.treasures = treasures
+        self.next_treasure_order = next_treasure_order
+        self.broken_walls = broken_walls
+        self.active_player_idx = active_player_idx
+        self.is_host_turn = is_host_turn
+
+
+PLAYER_STATE_ATTRS = ('cell', 'health', 'arrows', 'bombs', 'treasure', 'is_alive', 'is_active', 'is_treasure_swapped')
+_get_player_state = attrgetter(*PLAYER_STATE_ATTRS)
 
 
 class Field:
@@ -20,6 +98,8 @@ class Field:
 
     :param rules: rules of game
     :type rules: dict
+    :param generator: generator of the map, map is generated by rules if it is not provided
+    :type generator: MapGenerator | None
     :ivar gameplay_rules: gameplay rules
     :type gameplay_rules: dict
     :ivar game_map: game map
@@ -32,15 +112,55 @@ class Field:
     :type players: list[Player]
     """
 
-    def __init__(self, rules: dict):
+    def __init__(self, rules: dict, generator: MapGenerator = None):
         self.gameplay_rules = rules['gameplay_rules']
-        generator = MapGenerator(rules['generator_rules'])
+        if generator is None:
+            generator = MapGenerator(rules['generator_rules'])
+        self._random: Random = generator.random
         self.game_map: GameMap = generator.get_map()
         self.exit_cells: list[c.CellExit] = generator.get_exit_cells()
-        self.treasures: list[Treasure] = generator.get_treasures()
+        self.treasures: list[Treasure] = []
+        self._treasures_on_cells: dict[Position, list[Treasure]] = {}
+        self._treasures_order: dict[Treasure, int] = {}
+        self._next_treasure_order = 0
+        self._journal: list[TurnDelta] | None = None
+        self._journal_position = 0
+        self._turn_treasures: dict[Treasure, tuple[Position | None, int | None]] | None = None
+        for treasure in generator.get_treasures():
+            self._add_treasure(treasure)
         self.players: list[Player] = []
+        self._players_on_cells: dict[Position, list[Player]] | None = None
+        self._players_order: dict[str, int] = {}
         self._active_player_idx = 0
         self._is_host_turn: bool = False
+        self._broken_walls: list[BROKEN_WALL] = []
+        self._is_map_shared = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # players by positions are indexed again after loading
+        state['_players_on_cells'] = None
+        state['_players_order'] = {}
+        return state
+
+    def __setstate__(self, state: dict):
+        """fills indexes and journal of fields pickled before they were added"""
+        self.__dict__.update(state)
+        if '_treasures_on_cells' not in state:
+            self._random = Random()
+            self._treasures_order = {treasure: idx for idx, treasure in enumerate(self.treasures)}
+            self._next_treasure_order = len(self.treasures)
+            self._treasures_on_cells = {}
+            for treasure in self.treasures:
+                # positions of treasures are interned after the field is loaded
+                self._treasures_on_cells.setdefault(get_interned(treasure.position), []).append(treasure)
+            self._journal = None
+            self._journal_position = 0
+            self._turn_treasures = None
+            self._players_on_cells = None
+            self._players_order = {}
+            self._broken_walls = []
+            self._is_map_shared = False
 
     def spawn_bots(self, bots_amount: int) -> list[Player]:
         """
@@ -49,11 +169,12 @@ class Field:
         Each bot has random spawn point
         """
         bots = []
-        bot_names = sample(data_bots, bots_amount)
+        bot_names = self._random.sample(data_bots, bots_amount)
+        level_field = self.game_map.get_level(LevelPosition(0, 0, 0)).field
         for i in range(bots_amount):
             spawn_cell = c.NoneCell(Position(0, 0))
             while type(spawn_cell) in [c.NoneCell, c.CellExit]:
-                spawn_cell = choice(choice(self.game_map.get_level(LevelPosition(0, 0, 0)).field))
+                spawn_cell = self._random.choice(self._random.choice(level_field))
             bots.append(Player(spawn_cell, bot_names[i], True))
         return bots
 
@@ -68,13 +189,20 @@ class Field:
         player = Player(spawn_cell, name, turn=turn)
         if player not in self.players:
             self.players.append(player)
+            self._players_on_cells = None
             return True
         return False
 
+    def remove_player(self, name: str):
+        """removes player with given name from the field, if player has left the game"""
+        self.players = [player for player in self.players if player.name != name]
+        self._players_on_cells = None
+
     def sort_players(self):
         """sort players by turn order and .is_bot attribute"""
         self.players.sort(key=attrgetter('is_bot', 'turn'))
         self.players[0].is_active = True
+        self._players_on_cells = None
 
     def get_active_player(self) -> Player:
         """returns active Player object"""
@@ -92,7 +220,12 @@ class Field:
         treasures = []
         for exit_cell in self.exit_cells:
             treasures.extend(self._treasures_on_cell(exit_cell))
-        [self.treasures.remove(treasure) for treasure in treasures]
+        if treasures and self._journal_position and self._turn_treasures is None:
+            self._turn_treasures = {}
+            [self._remove_treasure(treasure) for treasure in treasures]
+            self._amend_last_turn_delta()
+        else:
+            [self._remove_treasure(treasure) for treasure in treasures]
         return treasures
 
     def action_handler(self, action: Actions, direction: Directions = None) -> r.RespHandler:
@@ -107,6 +240,7 @@ class Field:
         }
 
         player = self.players[self._active_player_idx]
+        turn_start = self._start_turn_delta() if self._journal is not None else None
 
         response = action_to_handler[action](player, direction)
         response.set_info(player.cell, [treasure.t_type for treasure in self._treasures_on_cell(player.cell)])
@@ -114,8 +248,121 @@ class Field:
         if self._is_host_turn:
             self._host_turn()
             self._is_host_turn = False
+        if turn_start is not None:
+            self._end_turn_delta(*turn_start)
         return response
 
+    def enable_journal(self):
+        """starts recording changes of each turn, recorded turns can be undone and redone"""
+        if self._journal is None:
+            self._journal = []
+            self._journal_position = 0
+
+    def undo(self) -> bool:
+        """
+        reverts last recorded turn
+
+        :return: True if turn was reverted, False if there are no turns to revert
+        """
+        if not self._journal_position:
+            return False
+        self._journal_position -= 1
+        self._apply_turn_delta(self._journal[self._journal_position], is_forward=False)
+        return True
+
+    def redo(self) -> bool:
+        """
+        repeats last reverted turn
+
+        :return: True if turn was repeated, False if there are no reverted turns
+        """
+        if self._journal is None or self._journal_position == len(self._journal):
+            return False
+        self._apply_turn_delta(self._journal[self._journal_position], is_forward=True)
+        self._journal_position += 1
+        return True
+
+    def _start_turn_delta(self) -> tuple[list[tuple], int, int, int, bool]:
+        self._turn_treasures = {}
+        for player in self.players:
+            if player.treasure is not None:
+                self._journal_treasure(player.treasure)
+        players_states = [_get_player_state(player) for player in self.players]
+        return (players_states, self._next_treasure_order, len(self._broken_walls),
+                self._active_player_idx, self._is_host_turn)
+
+    def _end_turn_delta(self, players_states: list[tuple], next_treasure_order: int, broken_walls_amount: int,
+                        active_player_idx: int, is_host_turn: bool):
+        players = []
+        for player, state in zip(self.players, players_states):
+            new_state = _get_player_state(player)
+            if new_state != state:
+                players.append((player, state, new_state))
+        treasures = [(treasure, state, self._get_treasure_state(treasure))
+                     for treasure, state in self._turn_treasures.items()]
+        self._turn_treasures = None
+        del self._journal[self._journal_position:]
+        self._journal.append(TurnDelta(
+            players, treasures,
+            (next_treasure_order, self._next_treasure_order),
+            tuple(self._broken_walls[broken_walls_amount:]),
+            (active_player_idx, self._active_player_idx),
+            (is_host_turn, self._is_host_turn)))
+        self._journal_position += 1
+
+    def _amend_last_turn_delta(self):
+        """adds changes of treasures made after the last recorded turn to its delta"""
+        delta = self._journal[self._journal_position - 1]
+        treasures = {treasure: (state, new_state) for treasure, state, new_state in delta.treasures}
+        for treasure, state in self._turn_treasures.items():
+            if treasure in treasures:
+                state = treasures[treasure][0]
+            treasures[treasure] = state, self._get_treasure_state(treasure)
+        delta.treasures = [(treasure, state, new_state) for treasure, (state, new_state) in treasures.items()]
+        self._turn_treasures = None
+        del self._journal[self._journal_position:]
+
+    def _apply_turn_delta(self, delta: TurnDelta, is_forward: bool):
+        state_idx = 2 if is_forward else 1
+        if is_forward:
+            for broken_wall in delta.broken_walls:
+                self._broken_walls.append(broken_wall)
+                self._set_broken_wall(broken_wall, is_broken=True)
+        else:
+            for broken_wall in reversed(delta.broken_walls):
+                self._broken_walls.pop()
+                self._set_broken_wall(broken_wall, is_broken=False)
+        for player_delta in delta.players:
+            player = player_delta[0]
+            for attr, value in zip(PLAYER_STATE_ATTRS, player_delta[state_idx]):
+                setattr(player, attr, value)
+            # cells may be recorded in the map which was shared with clones before the field copied it
+            player.cell = self.game_map.get_cell(player.cell.position)
+        for treasure_delta in delta.treasures:
+            self._set_treasure_state(treasure_delta[0], treasure_delta[state_idx])
+        self._next_treasure_order = delta.next_treasure_order[state_idx - 1]
+        self._active_player_idx = delta.active_player_idx[state_idx - 1]
+        self._is_host_turn = delta.is_host_turn[state_idx - 1]
+        self._players_on_cells = None
+
+    def _journal_treasure(self, treasure: Treasure):
+        """remembers state of treasure before its first change in recorded turn"""
+        if self._turn_treasures is not None and treasure not in self._turn_treasures:
+            self._turn_treasures[treasure] = self._get_treasure_state(treasure)
+
+    def _get_treasure_state(self, treasure: Treasure) -> tuple[Position | None, int | None]:
+        return treasure.position, self._treasures_order.get(treasure)
+
+    def _set_treasure_state(self, treasure: Treasure, state: tuple[Position | None, int | None]):
+        position, order = state
+        if treasure in self._treasures_order:
+            self._remove_treasure(treasure)
+        treasure.position = position
+        if order is not None:
+            self._treasures_order[treasure] = order
+            insort(self.treasures, treasure, key=self._treasures_order.get)
+            insort(self._treasures_on_cells.setdefault(position, []), treasure, key=self._treasures_order.get)
+
     def _get_neighbour_cell(self, position: Position, direction: Directions):
         return self.game_map.get_level(position.level_position).get_neighbour_cell(position, direction)
 
@@ -127,18 +374,152 @@ class Field:
         """
         wall = cell.walls[direction]
         if wall.breakable:
-            cell.add_wall(direction, w.WallEmpty())
             neighbour = self._get_neighbour_cell(cell.position, direction)
+            neighbour_wall = None
             if neighbour and neighbour.walls[-direction].breakable:
-                neighbour.walls[-direction] = w.WallEmpty()
+                neighbour_wall = neighbour.walls[-direction]
+            broken_wall = cell.position, direction, wall, neighbour_wall
+            self._broken_walls.append(broken_wall)
+            self._set_broken_wall(broken_wall, is_broken=True)
         return wall
 
+    def _set_broken_wall(self, broken_wall: BROKEN_WALL, is_broken: bool):
+        """breaks the wall or puts it back"""
+        if self._is_map_shared:
+            self._own_map()
+        position, direction, wall, neighbour_wall = broken_wall
+        level = self.game_map.get_level(position.level_position)
+        level.get_cell(position).add_wall(direction, w.WallEmpty() if is_broken else wall)
+        level.invalidate_transitions(position)
+        level.line_of_sight.invalidate(direction, -direction)
+        if neighbour_wall is not None:
+            neighbour = level.get_neighbour_cell(position, direction)
+            neighbour.walls[-direction] = w.WallEmpty() if is_broken else neighbour_wall
+            level.invalidate_transitions(neighbour.position)
+
+    def _own_map(self):
+        """copies map shared with clones of the field"""
+        self.game_map = deepcopy(self.game_map)
+        self.exit_cells = [self.game_map.get_cell(cell.position) for cell in self.exit_cells]
+        for player in self.players:
+            player.cell = self.game_map.get_cell(player.cell.position)
+        self._is_map_shared = False
+
+    def snapshot(self) -> FieldSnapshot:
+        """returns copy of mutable state of the field"""
+        players, treasures = self._copy_entities(self.players, self.treasures)
+        return FieldSnapshot(
+            players, treasures, [self._treasures_order[treasure] for treasure in self.treasures],
+            self._next_treasure_order, self._active_player_idx, self._is_host_turn, tuple(self._broken_walls))
+
+    def restore(self, snapshot: FieldSnapshot):
+        """restores state of the field from snapshot, snapshot can be restored many times"""
+        self._restore_broken_walls(snapshot.broken_walls)
+        self.players, self.treasures = self._copy_entities(snapshot.players, snapshot.treasures)
+        for player in self.players:
+            player.cell = self.game_map.get_cell(player.cell.position)
+        self._players_on_cells = None
+        self._treasures_order = dict(zip(self.treasures, snapshot.treasures_order))
+        self._next_treasure_order = snapshot.next_treasure_order
+        self._treasures_on_cells = {}
+        for treasure in self.treasures:
+            self._treasures_on_cells.setdefault(treasure.position, []).append(treasure)
+        self._active_player_idx = snapshot.active_player_idx
+        self._is_host_turn = snapshot.is_host_turn
+        if self._journal is not None:
+            self._journal = []
+            self._journal_position = 0
+
+    def clone(self) -> 'Field':
+        """returns copy of the field, map is shared with the copy until a wall is broken"""
+        field = copy(self)
+        field.restore(self.snapshot())
+        self._is_map_shared = field._is_map_shared = True
+        return field
+
+    def _restore_broken_walls(self, broken_walls: tuple[BROKEN_WALL, ...]):
+        common = 0
+        for own_broken_wall, broken_wall in zip(self._broken_walls, broken_walls):
+            if own_broken_wall is not broken_wall:
+                break
+            common += 1
+        for broken_wall in reversed(self._broken_walls[common:]):
+            self._set_broken_wall(broken_wall, is_broken=False)
+        for broken_wall in broken_walls[common:]:
+            self._set_broken_wall(broken_wall, is_broken=True)
+        self._broken_walls = list(broken_walls)
+
+    @staticmethod
+    def _copy_entities(players: list[Player], treasures: list[Treasure]) -> tuple[list[Player], list[Treasure]]:
+        """copies players and treasures, carried treasures are copied with their players"""
+        treasures_copies = [copy(treasure) for treasure in treasures]
+        players_copies = []
+        for player in players:
+            player_copy = copy(player)
+            if player.treasure is not None:
+                player_copy.treasure = copy(player.treasure)
+            players_copies.append(player_copy)
+        return players_copies, treasures_copies
+
     def _check_players(self, current_cell: c.Cell) -> list[Player]:
-        return [player for player in self.players
-                if player.cell == current_cell and not player.is_active and player.is_alive]
+        return [player for player in self._get_players_on_cells().get(current_cell.position, ())
+                if not player.is_active and player.is_alive]
+
+    def _get_players_on_cells(self) -> dict[Position, list[Player]]:
+        """returns players by their positions, players on a cell are in turn order"""
+        if self._players_on_cells is None:
+            self._players_on_cells = {}
+            self._players_order = {player.name: idx for idx, player in enumerate(self.players)}
+            for player in self.players:
+                self._players_on_cells.setdefault(player.cell.position, []).append(player)
+        return self._players_on_cells
+
+    def _move_player(self, player: Player, cell: c.CELL):
+        if self._players_on_cells is not None and player.cell.position is not cell.position:
+            players = self._players_on_cells[player.cell.position]
+            players.remove(player)
+            if not players:
+                del self._players_on_cells[player.cell.position]
+            insort(self._players_on_cells.setdefault(cell.position, []), player,
+                   key=lambda other: self._players_order[other.name])
+        player.move(cell)
 
     def _treasures_on_cell(self, cell: c.Cell) -> list[Treasure]:
-        return [treasure for treasure in self.treasures if cell.position == treasure.position]
+        return list(self._treasures_on_cells.get(cell.position, ()))
+
+    def _add_treasure(self, treasure: Treasure):
+        """add dropped treasure to field and to index of treasures on cells"""
+        self._journal_treasure(treasure)
+        self.treasures.append(treasure)
+        self._treasures_order[treasure] = self._next_treasure_order
+        self._next_treasure_order += 1
+        self._treasures_on_cells.setdefault(treasure.position, []).append(treasure)
+
+    def _remove_treasure(self, treasure: Treasure):
+        """remove treasure from field and from index of treasures on cells"""
+        self._journal_treasure(treasure)
+        self.treasures.remove(treasure)
+        self._unindex_treasure(treasure)
+        del self._treasures_order[treasure]
+
+    def _move_treasure(self, treasure: Treasure, position: Position):
+        """
+        move treasure to position
+
+        treasures on a cell are kept in the same order as in `self.treasures`
+        """
+        if position is treasure.position:
+            return
+        self._journal_treasure(treasure)
+        self._unindex_treasure(treasure)
+        treasure.position = position
+        insort(self._treasures_on_cells.setdefault(position, []), treasure, key=self._treasures_order.get)
+
+    def _unindex_treasure(self, treasure: Treasure):
+        cell_treasures = self._treasures_on_cells[treasure.position]
+        cell_treasures.remove(treasure)
+        if not cell_treasures:
+            del self._treasures_on_cells[treasure.position]
 
     def _treasure_swap_handler(self, player: Player, direction: Directions = None):
         treasures = self._treasures_on_cell(player.cell)
@@ -146,22 +527,23 @@ class Field:
         pl_treasure = player.drop_treasure()
         if pl_treasure:
             had_treasure = True
-            self.treasures.append(pl_treasure)
+            self._add_treasure(pl_treasure)
 
         treasure = treasures.pop(0)
-        self.treasures.remove(treasure)
+        self._remove_treasure(treasure)
         player.pick_up_treasure(treasure)
         return r.RespHandlerSwapTreasure(had_treasure)
 
     def _shooting_handler(self, active_player: Player, shot_direction: Directions):
         current_cell = active_player.cell
         active_player.shoot_bow()
-        damaged_players = []
-        while not damaged_players:
-            damaged_players = self._check_players(current_cell)
-            if current_cell.walls[shot_direction].weapon_collision:
-                break
-            current_cell = self._get_neighbour_cell(current_cell.position, shot_direction)
+        level_position = current_cell.position.level_position
+        targets = [position for position, players in self._get_players_on_cells().items()
+                   if position.level_position is level_position and
+                   any(not player.is_active and player.is_alive for player in players)]
+        line_of_sight = self.game_map.get_level(level_position).line_of_sight
+        target = line_of_sight.get_first_seen(current_cell.position, shot_direction, targets)
+        damaged_players = self._check_players(self.game_map.get_cell(target)) if target else []
 
         lost_treasure_players, dead_players = self._player_take_dmg_handler(damaged_players)
         self._pass_handler(active_player)
@@ -178,7 +560,7 @@ class Field:
 
             if treasure:
                 lost_treasure_players.append(player)
-                self.treasures.append(treasure)
+                self._add_treasure(treasure)
         return lost_treasure_players, dead_players
 
     def _bomb_throw_handler(self, active_player: Player, throwing_direction: Directions):
@@ -189,17 +571,16 @@ class Field:
 
     def _pass_handler(self, active_player: Player, direction: Directions = None):
         new_pl_cell = active_player.cell.idle(active_player.cell)
-        active_player.move(new_pl_cell)
+        self._move_player(active_player, new_pl_cell)
         self._cell_mechanics_activator(active_player, new_pl_cell)
         self._pass_turn_to_next_player()
         return r.RespHandlerSkip()
 
     def _movement_handler(self, active_player: Player, movement_direction: Directions):
         current_cell = active_player.cell
-        pl_collision, pl_state, wall_type = current_cell.check_wall(movement_direction)
-        cell = self._get_neighbour_cell(current_cell.position, movement_direction) if not pl_collision else current_cell
-        new_pl_cell = cell.active(current_cell) if pl_state else cell.idle(current_cell)
-        active_player.move(new_pl_cell)
+        level = self.game_map.get_level(current_cell.position.level_position)
+        cell, new_pl_cell, wall_type = level.get_transition(current_cell, movement_direction)
+        self._move_player(active_player, new_pl_cell)
         self._cell_mechanics_activator(active_player, new_pl_cell)
 
         self._pass_turn_to_next_player()
@@ -235,9 +616,9 @@ class Field:
 
     def _treasure_idle_handler(self, treasure: Treasure):
         if treasure.position:
-            treasure.position = self.game_map.get_cell(treasure.position).treasure_movement().position
+            self._move_treasure(treasure, self.game_map.get_cell(treasure.position).treasure_movement().position)
 
     def _update_treasures_exit(self, player):
         treasure = player.drop_treasure()
         if treasure:
-            self.treasures.append(treasure)
+            self._add_treasure(treasure)
@@ -1,12 +1,26 @@
-from .cell import CELL, NoneCell
+from .cell import CELL, NoneCell, CellRiver
+from .wall import WALL
+from .line_of_sight import LineOfSight
 from ..global_env.enums import Directions
 from ..global_env.types import LevelPosition, Position
 
 
 class GameLevel:
+    """
+    Game level object
+
+    :ivar level_position: position of the level
+    :type level_position: LevelPosition
+    :ivar field: cells of the level
+    :type field: list[list[CELL]]
+    :ivar line_of_sight: line of sight index of the level
+    :type line_of_sight: LineOfSight
+    """
     def __init__(self, level_position: LevelPosition, field: list[list[CELL]]):
         self.level_position: LevelPosition = level_position
         self.field: list[list[CELL]] = field
+        self._transitions: dict[tuple[Position, Directions], tuple[CELL, CELL, type[WALL]]] = {}
+        self.line_of_sight = LineOfSight(self)
 
     def get_neighbour_cell(self, position: Position, direction: Directions) -> CELL | None:
         x, y = direction.get_neighbour_cords(position.x, position.y)
@@ -15,8 +29,37 @@ class GameLevel:
         except IndexError:
             return None
 
+    def get_transition(self, cell: CELL, direction: Directions) -> tuple[CELL, CELL, type[WALL]]:
+        """
+        returns result of moving from the cell by direction, results are cached until the cell is changed
+
+        :return: cell behind the wall, cell where the move ends and type of the wall
+        """
+        key = cell.position, direction
+        try:
+            return self._transitions[key]
+        except KeyError:
+            pass
+        pl_collision, pl_state, wall_type = cell.check_wall(direction)
+        target_cell = self.get_neighbour_cell(cell.position, direction) if not pl_collision else cell
+        new_cell = target_cell.active(cell) if pl_state else target_cell.idle(cell)
+        transition = self._transitions[key] = target_cell, new_cell, wall_type
+        return transition
+
+    def invalidate_transitions(self, position: Position):
+        """drops cached moves from the cell"""
+        for direction in Directions:
+            self._transitions.pop((position, direction), None)
+
     def set_cell(self, position: Position, new_cell: CELL):
+        self._transitions.clear()
+        self.line_of_sight.invalidate()
+        old_cell = self.field[position.y][position.x]
         self.field[position.y][position.x] = new_cell
+        if isinstance(old_cell, CellRiver) and isinstance(new_cell, CellRiver) and old_cell.river_id is not None:
+            river = old_cell.river
+            river[old_cell.river_idx] = new_cell
+            CellRiver.link_river(river, old_cell.river_id)
 
     def get_cell(self, position: Position) -> CELL:
         return self.field[position.y][position.x]
@@ -29,3 +72,27 @@ class GameLevel:
             [{'x': cell.position.x, 'y': cell.position.y} if type(cell) is not NoneCell else None for cell in row[1:-1]]
             for row in self.field[1:-1]
         ]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_transitions']
+        del state['line_of_sight']
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._transitions = {}
+        self.line_of_sight = LineOfSight(self)
+        # array levels keep no cell objects, they are never pickled without river topology
+        if 'field' in state:
+            self._link_legacy_rivers()
+
+    def _link_legacy_rivers(self):
+        """precomputes topology of rivers of level pickled before it was precomputed"""
+        rivers: dict[int, list[CellRiver]] = {}
+        for row in self.field:
+            for cell in row:
+                if isinstance(cell, CellRiver) and not hasattr(cell, 'river_id'):
+                    rivers.setdefault(id(cell.river), cell.river)
+        for river_id, river in enumerate(rivers.values()):
+            CellRiver.link_river(river, river_id)
@@ -0,0 +1,71 @@
+from typing import Iterable
+
+from ..global_env.enums import Directions
+from ..global_env.types import Position
+
+
+class LineOfSight:
+    """
+    Line of sight index of a grid
+
+    Splits rows and columns of the grid into segments by walls with weapon collision.
+    A segment is known by its last cell in the direction of sight,
+    so two cells see each other if they have the same last cell.
+    Segments are calculated lazily and kept until they are invalidated.
+
+    :param grid: grid of cells with get_cell and get_neighbour_cell methods, level or bot grid
+    """
+
+    def __init__(self, grid):
+        self._grid = grid
+        self._segments: dict[Directions, dict[Position, tuple[Position, int]]] = {
+            direction: {} for direction in Directions}
+
+    def get_segment(self, position: Position, direction: Directions) -> tuple[Position, int]:
+        """
+        :return: last cell of segment by direction and steps from position to it
+        """
+        segments = self._segments[direction]
+        try:
+            return segments[position]
+        except KeyError:
+            pass
+        path = []
+        visited = set()
+        current = position
+        while current not in segments:
+            path.append(current)
+            visited.add(current)
+            if self._grid.get_cell(current).walls[direction].weapon_collision:
+                segments[current] = current, 0
+                path.pop()
+                break
+            neighbour = self._grid.get_neighbour_cell(current, direction)
+            if neighbour is None or neighbour.position in visited:
+                segments[current] = current, 0
+                path.pop()
+                break
+            current = neighbour.position
+        end, steps = segments[current]
+        for path_position in reversed(path):
+            steps += 1
+            segments[path_position] = end, steps
+        return segments[position]
+
+    def get_first_seen(self, position: Position, direction: Directions,
+                       positions: Iterable[Position]) -> Position | None:
+        """
+        :return: the nearest of positions seen from position by direction, position itself is seen first
+        """
+        end, steps = self.get_segment(position, direction)
+        target, target_steps = None, -1
+        for other_position in positions:
+            other_end, other_steps = self.get_segment(other_position, direction)
+            if other_end is end and target_steps < other_steps <= steps:
+                target, target_steps = other_position, other_steps
+        return target
+
+    def invalidate(self, *directions: Directions):
+        """drops segments by directions, all segments if directions are not provided"""
+        for direction in directions or Directions:
+            self._segments[direction].clear()
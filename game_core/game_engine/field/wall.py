@@ -5,49 +5,75 @@ class WallEmpty:
     """
     Base Wall object
 
-    :ivar breakable: can wall be broken
+    Walls are immutable, each wall type has the only instance which is returned on creation
+
+    :cvar breakable: can wall be broken
     :type breakable: bool
-    :ivar weapon_collision: weapon collision with wall
+    :cvar weapon_collision: weapon collision with wall
     :type weapon_collision: bool
-    :ivar player_collision: player collision with wall
+    :cvar player_collision: player collision with wall
     :type player_collision: bool
-    :ivar player_state: player state after interaction with wall
+    :cvar player_state: player state after interaction with wall
     :type player_state: bool
     """
 
-    __slots__ = 'breakable', 'weapon_collision', 'player_collision', 'player_state'
+    __slots__ = ()
+    _instances: dict[type['WallEmpty'], 'WallEmpty'] = {}
+
+    breakable = True
+    weapon_collision = False
+    player_collision = False
+    player_state = True  # True if active else False
 
-    def __init__(self):
-        self.breakable = True
-        self.weapon_collision = False
-        self.player_collision = False
-        self.player_state = True  # True if active else False
+    def __new__(cls):
+        try:
+            return WallEmpty._instances[cls]
+        except KeyError:
+            return WallEmpty._instances.setdefault(cls, super().__new__(cls))
 
     def handler(self):
         """returns wall parameters"""
         return self.player_collision, self.player_state, type(self)
 
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return type(self), ()
+
+    def __setstate__(self, state):
+        """walls pickled before they became immutable carry their flags, which are the same as class flags"""
+
 
 class WallConcrete(WallEmpty):
     """Concrete Wall object"""
-    def __init__(self):
-        super().__init__()
-        self.weapon_collision = True
-        self.player_collision = True
+    __slots__ = ()
+
+    weapon_collision = True
+    player_collision = True
 
 
 class WallOuter(WallConcrete):
     """Outer Wall object"""
-    def __init__(self):
-        super().__init__()
-        self.breakable = False
+    __slots__ = ()
+
+    breakable = False
 
 
 class WallExit(WallOuter):
     """Exit Wall object"""
-    def __init__(self):
-        super().__init__()
-        self.player_collision = False
+    __slots__ = ()
+
+    player_collision = False
 
     def handler(self):  # todo выход не должен пропускать без клада
         return super().handler()
@@ -55,17 +81,16 @@ class WallExit(WallOuter):
 
 class WallEntrance(WallExit):
     """Entrance Wall object"""
-    def __init__(self):
-        super().__init__()
+    __slots__ = ()
 
 
 class WallRubber(WallEmpty):
     """Rubber Wall object"""
-    def __init__(self):
-        super().__init__()
-        self.weapon_collision = True
-        self.player_collision = True
-        self.player_state = False
+    __slots__ = ()
+
+    weapon_collision = True
+    player_collision = True
+    player_state = False
 
 
 WALL = Union[WallEmpty, WallConcrete, WallOuter, WallExit, WallEntrance, WallRubber]
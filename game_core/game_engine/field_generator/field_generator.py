@@ -1,4 +1,4 @@
-from random import choice, sample, randint
+from random import Random
 
 from ..field.game_level import GameLevel
 from ..global_env.enums import Directions
@@ -18,7 +18,8 @@ class FieldGenerator:
     Its generate game-field with given rules
     """
 
-    def __init__(self, generator_rules: dict, pattern: LevelPattern = None):
+    def __init__(self, generator_rules: dict, pattern: LevelPattern = None, rnd: Random = None):
+        self.random = rnd if rnd is not None else Random(generator_rules['seed'])
         self.rows = generator_rules['rows'] + 2
         self.cols = generator_rules['cols'] + 2
         self.pattern = pattern
@@ -71,7 +72,8 @@ class FieldGenerator:
     def _generate_rivers(self, river_rules: dict):
         if not river_rules['has_river']:
             return []
-        rg = RiverGenerator(self.cols, self.rows, self.pattern.pattern, self.levels[0].field, self.ground_cells)
+        rg = RiverGenerator(self.cols, self.rows, self.pattern.pattern, self.levels[0].field, self.ground_cells,
+                            self.random)
         return rg.spawn_rivers(river_rules)
 
     def _generate_armory(self, is_separated_armory: bool):
@@ -79,19 +81,19 @@ class FieldGenerator:
         :param is_separated_armory: True if needed 2 different types
         """
         if is_separated_armory:
-            cell = choice(self.ground_cells)
+            cell = self.random.choice(self.ground_cells)
             self.levels[0].set_cell(cell.position, CellArmoryWeapon(cell.position))
             self.ground_cells.remove(cell)
-            cell = choice(self.ground_cells)
+            cell = self.random.choice(self.ground_cells)
             self.levels[0].set_cell(cell.position, CellArmoryExplosive(cell.position))
             self.ground_cells.remove(cell)
         else:
-            cell = choice(self.ground_cells)
+            cell = self.random.choice(self.ground_cells)
             self.levels[0].set_cell(cell.position, CellArmory(cell.position))
             self.ground_cells.remove(cell)
 
     def _generate_clinic(self):
-        cell = choice(self.ground_cells)
+        cell = self.random.choice(self.ground_cells)
         self.levels[0].set_cell(cell.position, CellClinic(cell.position))
         self.ground_cells.remove(cell)
 
@@ -104,9 +106,9 @@ class FieldGenerator:
             for cell in row:
                 if type(cell) is not NoneCell:
                     cells.append(cell)
-        cells_walls = sample(cells, int(len(cells) * 0.6))
+        cells_walls = self.random.sample(cells, int(len(cells) * 0.6))
         for cell in cells_walls:
-            directions: list[Directions] = sample(list(Directions), randint(1, 2))
+            directions: list[Directions] = self.random.sample(list(Directions), self.random.randint(1, 2))
             for direction in directions:
                 if not isinstance(cell.walls[direction], WallOuter):
                     cell.add_wall(direction, WallConcrete())
@@ -150,14 +152,14 @@ class FieldGenerator:
 
     def _create_exit(self, outer_cells: list[Cell], amount: int) -> list[CellExit]:
         exit_cells = []
-        cells = sample(outer_cells, min(amount, len(outer_cells)))
+        cells = self.random.sample(outer_cells, min(amount, len(outer_cells)))
         for cell in cells:
 
             dirs = []
             for direction in Directions:
                 if isinstance(cell.walls[direction], WallOuter):
                     dirs.append(direction)
-            direction = choice(dirs)
+            direction = self.random.choice(dirs)
             cell.add_wall(direction, WallExit())
             exit_cell = CellExit(cell.position.get_adjacent(direction), -direction)
             exit_cells.append(exit_cell)
@@ -167,7 +169,7 @@ class FieldGenerator:
     def _spawn_treasures(self, treasures_rules: list[int]) -> list[Treasure]:
         treasures = []
 
-        treasure_cells = sample(self.ground_cells, sum(treasures_rules))
+        treasure_cells = self.random.sample(self.ground_cells, sum(treasures_rules))
 
         for _ in range(treasures_rules[0]):
             cell = treasure_cells.pop()
@@ -1,5 +1,7 @@
-from random import seed
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from random import Random
 
+from ..field.array_level import ArrayGameLevel
 from ..field.game_map import GameMap
 from .field_generator import FieldGenerator
 from ..entities.treasure import Treasure
@@ -14,10 +16,17 @@ class MapGenerator:
     This is Map generator object
 
     Its generate game-map with given rules
+
+    :param generator_rules: generator rules
+    :type generator_rules: dict
+    :param rnd: random generator, by default it is seeded with seed from generator rules
+    :type rnd: Random | None
+    :ivar random: random generator used for generation
+    :type random: Random
     """
 
-    def __init__(self, generator_rules: dict):
-        seed(generator_rules['seed'])
+    def __init__(self, generator_rules: dict, rnd: Random = None):
+        self.random = rnd if rnd is not None else Random(generator_rules['seed'])
         self.generator_rules = generator_rules
         self.rows = self.generator_rules['rows'] + 2
         self.cols = self.generator_rules['cols'] + 2
@@ -27,6 +36,23 @@ class MapGenerator:
         self.treasures: list[Treasure] = []
         self._generate_map()
 
+    @classmethod
+    def generate_many(cls, rules_list: list[dict], max_workers: int = None,
+                      use_processes: bool = False) -> list['MapGenerator']:
+        """
+        generates maps for each of generator rules in a pool of threads or processes
+
+        each map is generated with its own random generator, so maps are the same as generated one by one
+
+        :param rules_list: generator rules of each map
+        :param max_workers: size of the pool
+        :param use_processes: use process pool instead of thread pool
+        :return: generators in order of rules
+        """
+        executor: Executor = ProcessPoolExecutor(max_workers) if use_processes else ThreadPoolExecutor(max_workers)
+        with executor:
+            return list(executor.map(cls, rules_list))
+
     def get_map(self):
         return self.game_map
 
@@ -53,11 +79,17 @@ class MapGenerator:
             self._generate_level(level_pattern)
 
     def _generate_level(self, level_pattern: LevelPattern):
-        level_generator = FieldGenerator(self.generator_rules, level_pattern)
+        level_generator = FieldGenerator(self.generator_rules, level_pattern, self.random)
+        is_array_backend = self.generator_rules.get('level_backend', 'list') == 'array'
 
+        levels = level_generator.get_fields()
+        if is_array_backend:
+            levels = [ArrayGameLevel.from_level(level) for level in levels]
         for cell in level_generator.get_exit_cells():
+            if is_array_backend:
+                cell = levels[0].get_cell(cell.position)
             self.exit_cells.append(cell)
         for treasure in level_generator.get_treasures():
             self.treasures.append(treasure)
-        for level in level_generator.get_fields():
+        for level in levels:
             self.game_map.game_map.append(level)
@@ -1,4 +1,4 @@
-from random import choice, shuffle, randint
+from random import Random
 
 from .level_pattern import PatternCell
 from ..global_env.enums import Directions
@@ -9,11 +9,14 @@ class RiverGenerator:
     def __init__(self, cols: int, rows: int,
                  pattern: list[list[PatternCell]],
                  field: list[list[Cell]],
-                 ground_cells: list[Cell]):
+                 ground_cells: list[Cell],
+                 rnd: Random):
+        self.__random = rnd
         self.__cols, self.__rows = cols, rows
         self.__pattern = pattern
         self.__field = field
         self.__ground_cells = ground_cells
+        self.__rivers_amount = 0
 
     def spawn_rivers(self, river_rules: dict) -> list[list[CellRiver]]:
         river_lengths = self.__calc_river_lengths(
@@ -31,13 +34,14 @@ class RiverGenerator:
             return
         river = [CellRiver(riv_cell.position) for riv_cell in river_tmp]
         river[-1] = CellRiverMouth(river[-1].position)
+        CellRiver.link_river(river, self.__rivers_amount)
+        self.__rivers_amount += 1
         for riv_cell in river:
-            riv_cell.add_river_list(river)
             self.__field[riv_cell.position.y][riv_cell.position.x] = riv_cell
         return river
 
     def __gen_river(self, length: int) -> list[Cell] | None:
-        shuffle(self.__ground_cells)
+        self.__random.shuffle(self.__ground_cells)
         for source in self.__ground_cells:
             river = self.__gen_next_river_cell(length - 1, [source])
             if river:
@@ -62,7 +66,7 @@ class RiverGenerator:
             empty_neighbours = self.__check_directions(river[-1])
 
             while empty_neighbours:
-                next_cell = choice(empty_neighbours)
+                next_cell = self.__random.choice(empty_neighbours)
                 empty_neighbours.remove(next_cell)
                 self.__pattern[river[-1].position.y][river[-1].position.x].visited = True
                 river.append(next_cell)
@@ -75,13 +79,13 @@ class RiverGenerator:
                 return
 
     def __calc_river_lengths(self, min_coverage: int, max_coverage: int, min_len: int) -> list[int]:
-        coverage = randint(min_coverage, max_coverage) / 100
+        coverage = self.__random.randint(min_coverage, max_coverage) / 100
         river_cells_amount = int((len(self.__ground_cells) - 5) * coverage)
         if river_cells_amount < min_len * 2:
             return [river_cells_amount]
         rivers = []
         while river_cells_amount > 0:
-            riv_len = randint(min_len, river_cells_amount)
+            riv_len = self.__random.randint(min_len, river_cells_amount)
             if river_cells_amount - riv_len < min_len:
                 riv_len = river_cells_amount
             river_cells_amount -= riv_len
@@ -1,22 +1,45 @@
-from .field.field import Field
+from copy import copy
+
+from .field.field import Field, FieldSnapshot
+from .field_generator.map_generator import MapGenerator
 from .entities.player import Player
 from .field.response import RespHandler
 from .global_env.enums import Actions, Directions, TreasureTypes
-from .global_env.types import LevelPosition, Position
+from .global_env.types import LevelPosition, Position, intern_positions
 
 
 class Game:
     """
     This class used for top-level interaction with the game object
 
+    :param generator: generator of the map, map is generated by rules if it is not provided
+    :type generator: MapGenerator | None
     :ivar field: game field object which contains all logic and game objects
     :type field: Field
     """
 
-    def __init__(self, rules: dict):
-        self.field = Field(rules=rules)
+    def __init__(self, rules: dict, generator: MapGenerator = None):
+        self.field = Field(rules=rules, generator=generator)
         self.field.players = self.field.spawn_bots(rules['bots_amount'])
 
+    def snapshot(self) -> FieldSnapshot:
+        """returns copy of mutable state of the game: players, treasures, broken walls and turn"""
+        return self.field.snapshot()
+
+    def restore(self, snapshot: FieldSnapshot):
+        """restores state of the game from snapshot"""
+        self.field.restore(snapshot)
+
+    def clone(self) -> 'Game':
+        """returns copy of the game which shares map with this game until a wall is broken"""
+        game = copy(self)
+        game.field = self.field.clone()
+        return game
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        intern_positions(self)
+
     def get_current_player(self) -> Player:
         """returns current Player object"""
         return self.field.get_active_player()
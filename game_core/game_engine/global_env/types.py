@@ -1,19 +1,49 @@
+import threading
+from enum import Enum
+from functools import partial
+from types import FunctionType, ModuleType
+
 from .enums import Directions
 
+# `is_loaded` is set when positions pickled before they were interned are loaded, see `intern_positions`,
+# objects are loaded and their `__setstate__` is called in one thread, so each load has its own flag
+_legacy = threading.local()
+
 
 class LevelPosition:
-    __slots__ = 'level', 'sub_level', 'dimension'
+    """
+    describes the position of a level
+
+    Level positions are immutable and interned: equal level positions are the same object,
+    so they are compared by identity and can be used as dict keys.
+    Each level position holds a pool of positions on that level.
+    """
+
+    __slots__ = 'level', 'sub_level', 'dimension', '_positions'
 
-    def __init__(self, level: int, sub_level: int, dimension: int = 0):
+    _pool: dict[tuple[int, int, int], 'LevelPosition'] = {}
+
+    def __new__(cls, level: int = None, sub_level: int = None, dimension: int = 0):
         """
 
         :param level: game level number
         :param sub_level: game sub level number
         :param dimension: dimension of a level
         """
-        self.level = level
-        self.sub_level = sub_level
-        self.dimension = dimension
+        if level is None:
+            # level position pickled before it was interned, its fields are set by `__setstate__`
+            return object.__new__(cls)
+        key = (level, sub_level, dimension)
+        try:
+            return cls._pool[key]
+        except KeyError:
+            pass
+        level_position = object.__new__(cls)
+        object.__setattr__(level_position, 'level', level)
+        object.__setattr__(level_position, 'sub_level', sub_level)
+        object.__setattr__(level_position, 'dimension', dimension)
+        object.__setattr__(level_position, '_positions', {})
+        return cls._pool.setdefault(key, level_position)
 
     def to_dict(self):
         return {
@@ -22,14 +52,37 @@ class LevelPosition:
             'dimension': self.dimension,
         }
 
-    def __eq__(self, other: 'LevelPosition'):
-        return self.level == other.level and self.sub_level == other.sub_level and self.dimension == other.dimension
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __reduce__(self):
+        return LevelPosition, (self.level, self.sub_level, self.dimension)
+
+    def __setstate__(self, state):
+        """sets fields of level position pickled before it was interned, see `intern_positions`"""
+        _set_legacy_state(self, state)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f'LevelPosition({self.level}, {self.sub_level}, {self.dimension})'
 
 
 class Position:
     """
     describes the position of an object
 
+    Positions are immutable and interned in a pool of their level:
+    equal positions are the same object, so they are compared by identity
+    and can be used as dict keys and set items
+
     :ivar x: x position
     :ivar y: y position
     :ivar level_position: position of level
@@ -37,15 +90,44 @@ class Position:
 
     __slots__ = 'x', 'y', 'level_position'
 
-    def __init__(self, x: int, y: int, level_position: LevelPosition = None):
-        self.x = x
-        self.y = y
-        self.level_position = level_position
+    _pool: dict[tuple[int, int], 'Position'] = {}  # positions without level
+
+    def __new__(cls, x: int = None, y: int = None, level_position: LevelPosition = None):
+        if x is None:
+            # position pickled before it was interned, its fields are set by `__setstate__`
+            return object.__new__(cls)
+        pool = level_position._positions if level_position is not None else cls._pool
+        try:
+            return pool[x, y]
+        except KeyError:
+            pass
+        position = object.__new__(cls)
+        object.__setattr__(position, 'x', x)
+        object.__setattr__(position, 'y', y)
+        object.__setattr__(position, 'level_position', level_position)
+        return pool.setdefault((x, y), position)
 
-    def __eq__(self, other: 'Position'):
-        """True if coords and level_pos are same"""
-        level_pos_eq = self.level_position == other.level_position if self.level_position else True  # fixme
-        return self.x == other.x and self.y == other.y and level_pos_eq
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __reduce__(self):
+        return Position, (self.x, self.y, self.level_position)
+
+    def __setstate__(self, state):
+        """sets fields of position pickled before it was interned, see `intern_positions`"""
+        _set_legacy_state(self, state)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f'Position({self.x}, {self.y}, {self.level_position})'
 
     def __sub__(self, other: 'Position') -> Directions:
         """
@@ -83,3 +165,78 @@ class Position:
             'y': self.y,
             'level_position': self.level_position.to_dict()
         }
+
+
+def _set_legacy_state(obj: LevelPosition | Position, state: dict | tuple):
+    _legacy.is_loaded = True
+    # objects with slots are pickled with a tuple of dict state and slots state
+    for name, value in (state[1] if isinstance(state, tuple) else state).items():
+        object.__setattr__(obj, name, value)
+
+
+def get_interned(value):
+    """returns interned position or level position equal to value, value itself if it is another object"""
+    value_type = type(value)
+    if value_type is Position:
+        return Position(value.x, value.y, get_interned(value.level_position))
+    if value_type is LevelPosition:
+        return LevelPosition(value.level, value.sub_level, value.dimension)
+    if value_type is tuple:
+        items = tuple(get_interned(item) for item in value)
+        return items if any(item is not old_item for item, old_item in zip(items, value)) else value
+    return value
+
+
+def intern_positions(root: object):
+    """
+    replaces positions and level positions pickled before they were interned by the interned ones
+    in all objects reachable from root, it is called by objects which are pickled as a whole
+    after they are loaded, and does nothing if no such positions were loaded in this thread
+    """
+    if not getattr(_legacy, 'is_loaded', False):
+        return
+    _legacy.is_loaded = False
+    visited: set[int] = set()
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in visited or isinstance(obj, _ATOMIC_TYPES) or obj is None:
+            continue
+        visited.add(id(obj))
+        if isinstance(obj, (tuple, set, frozenset)):
+            # tuples are replaced by their holders, sets can't hold positions pickled before they were hashable
+            stack.extend(obj)
+            continue
+        if isinstance(obj, list):
+            items, set_item = enumerate(obj), obj.__setitem__
+        elif isinstance(obj, dict):
+            items, set_item = list(obj.items()), obj.__setitem__
+        else:
+            items, set_item = _get_attributes(obj), partial(_set_attribute, obj)
+        for name, value in items:
+            interned = get_interned(value)
+            if interned is not value:
+                set_item(name, interned)
+            stack.append(interned)
+
+
+def _get_attributes(obj: object) -> list[tuple[str, object]]:
+    attributes = list(getattr(obj, '__dict__', {}).items())
+    for cls in type(obj).__mro__:
+        slots = getattr(cls, '__slots__', ())
+        for name in [slots] if isinstance(slots, str) else slots:
+            if name != '__dict__' and hasattr(obj, name):
+                attributes.append((name, getattr(obj, name)))
+    return attributes
+
+
+def _set_attribute(obj: object, name: str, value):
+    # objects may be immutable, so their attributes are set directly
+    if name in getattr(obj, '__dict__', {}):
+        obj.__dict__[name] = value
+    else:
+        object.__setattr__(obj, name, value)
+
+
+# positions are interned as they are met, so their fields are not visited
+_ATOMIC_TYPES = (type, str, bytes, int, float, Enum, Position, LevelPosition, ModuleType, FunctionType)
@@ -23,7 +23,8 @@ def get_rules() -> dict:
                 'has_walls': True,
                 'concrete': True,
                 'rubber': False,
-            }
+            },
+            'level_backend': 'list',  # 'list' of cell objects or 'array' of NumPy planes
         },
         'host_rules': {},
         'players_amount': 2,
@@ -32,9 +33,25 @@ def get_rules() -> dict:
             'fast_win': True,  # player wins if he is the only survivor
             'diff_outer_concrete_walls': False,  # if true you won't know difference between WallConcrete and WallOuter
         },
+        'bot_rules': {
+            'dedupe_leaves': False,  # join leaves with the same field state in any branches of a tree after each step
+            'compact_every': 10,  # compact belief trees every N turns, 0 to never compact
+            'max_leaves': 0,  # keep at most N weighted leaves per player, 0 to track every leaf
+            # update trees of players in N long-lived forked worker processes, 0 to update them in the main one,
+            # workers are forked from the process of bot, so it must not be used inside the server process
+            'processes': 0,
+            'parallel_min_leaves': 256,  # update trees in the main process if they have fewer leaves in total
+            'split_leaves': False,  # split leaves of each tree between workers, else a tree is updated by one
+            'factorized_opponents': False,  # keep matched enemy leaves as candidate positions instead of merging them
+        },
         'player_stat': {
             'max_health': 2,
             'max_arrows': 3,
             'max_bombs': 3
         }
     }
+
+
+def get_bot_rules(rules: dict) -> dict:
+    """returns bot rules of game rules, rules missing in them, e.g. in rules of old rooms, are taken from base rules"""
+    return get_rules()['bot_rules'] | rules.get('bot_rules', {})
@@ -387,7 +387,8 @@ class GameState(db.Model):
     def remove_player(self, player_name: str):
         for player in self.state.field.players:
             if player.name == player_name and not player.is_bot:
-                self.state.field.players.remove(player)
+                self.state.field.remove_player(player_name)
+                break
 
 
 class BotState(db.Model):
@@ -0,0 +1,439 @@
+import pickle
+import random
+import unittest
+
+from game_core.bots_ai import parallel_turn
+from game_core.bots_ai.core import BotAI
+from game_core.bots_ai.decision_making.decision_maker import DecisionMaker
+from game_core.bots_ai.leaves_matcher import LeavesMatcher
+from game_core.bots_ai.field_handler.bitboards import GridBitboards
+from game_core.bots_ai.field_handler.common_data import CommonData
+from game_core.bots_ai.field_handler.field_obj import UnknownCell, UnknownWall
+from game_core.bots_ai.field_handler.field_state import FieldState
+from game_core.bots_ai.field_handler.grid import Grid
+from game_core.bots_ai.field_handler.player_state import PlayerState
+from game_core.bots_ai.field_handler.tree_node import Node
+from game_core.bots_ai.field_handler.zobrist import get_players_key
+from game_core.game_engine import get_rules
+from game_core.game_engine.field import cell, wall
+from game_core.game_engine.global_env.enums import Directions
+from game_core.game_engine.global_env.types import Position
+
+
+def make_grid(size: int = 4) -> Grid:
+    return Grid([[UnknownCell(Position(x, y)) for x in range(size)] for y in range(size)])
+
+
+def make_bots(size: int = 5, **bot_rules) -> tuple[BotAI, BotAI]:
+    """returns bot with default rules and bot with given bot rules, players of both have the same spawns"""
+    rules, other_rules = get_rules(), get_rules()
+    for game_rules in [rules, other_rules]:
+        game_rules['generator_rules'].update(rows=size, cols=size)
+    other_rules['bot_rules'].update(bot_rules)
+    spawn_points = {'p1': Position(1, 1), 'p2': Position(2, 3)}
+    return BotAI(rules, spawn_points), BotAI(other_rules, spawn_points)
+
+
+def make_response(player_name: str, action: str, direction: str | None, type_cell: type[cell.CELL],
+                  type_cell_end: type[cell.CELL] = None, wall_type: type[wall.WALL] = None,
+                  is_diff_cells: bool = False) -> dict:
+    """returns raw response of turn without treasures, cell at the end of turn is the cell after wall by default"""
+    return {'player_name': player_name, 'action': action, 'direction': direction, 'response': {
+        'type_out_treasure': None, 'cell_treasures_amount': 0, 'wall_passed': not wall_type,
+        'wall_type': wall_type, 'diff_cells': is_diff_cells,
+        'type_cell_after_wall_check': type_cell, 'type_cell_at_end_of_turn': type_cell_end or type_cell}}
+
+
+class TestGrid(unittest.TestCase):
+
+    def test_copy_on_write(self):
+        grid = make_grid()
+        grid_copy = grid.copy()
+        self.assertTrue(all(row is other_row for row, other_row in zip(grid.get_field(), grid_copy.get_field())))
+
+        grid_copy.set_cell(cell.Cell(Position(1, 1)), Position(1, 1))
+        grid_copy.add_wall(Position(2, 2), Directions.top, wall.WallConcrete)
+        self.assertIs(type(grid.get_cell(Position(1, 1))), UnknownCell)
+        self.assertIs(grid.get_cell(Position(2, 2)).walls[Directions.top], UnknownWall())
+        self.assertIs(grid.get_field()[0], grid_copy.get_field()[0])
+        self.assertIsNot(grid.get_field()[1], grid_copy.get_field()[1])
+
+        grid.set_cell(cell.CellClinic(Position(0, 0)), Position(0, 0))
+        self.assertIs(type(grid_copy.get_cell(Position(0, 0))), UnknownCell)
+        self.assertIs(type(grid_copy.get_cell(Position(1, 1))), cell.Cell)
+
+    def test_bitboards(self):
+        grid = make_grid()
+        bitboards = grid.get_bitboards()
+        other_grid = grid.copy()
+        self.assertIs(other_grid.get_bitboards(), bitboards)
+
+        grid.set_cell(cell.CellClinic(Position(1, 1)), Position(1, 1))
+        grid.set_cell(cell.CellRiver(Position(2, 1), Directions.bottom), Position(2, 1))
+        other_grid.set_cell(cell.CellRiver(Position(2, 1), Directions.bottom), Position(2, 1))
+        other_grid.add_wall(Position(3, 3), Directions.left, wall.WallConcrete)
+        bitboards, other_bitboards = grid.get_bitboards(), other_grid.get_bitboards()
+        self.assertIsNot(bitboards, other_bitboards)
+        self.assertEqual(bitboards.get_conflicts(other_bitboards), 0)
+        self.assertEqual(list(bitboards.iter_coords(bitboards.get_cells(cell.CellClinic))), [(1, 1)])
+        self.assertEqual(list(bitboards.iter_coords(bitboards.get_merge_candidates(other_bitboards))),
+                         [(2, 3), (3, 3)])
+
+        other_grid.set_cell(cell.Cell(Position(1, 1)), Position(1, 1))
+        other_grid.set_cell(cell.CellRiver(Position(2, 1), Directions.top), Position(2, 1))
+        conflicts = grid.get_bitboards().get_conflicts(other_grid.get_bitboards())
+        self.assertEqual(list(bitboards.iter_coords(conflicts)), [(1, 1), (2, 1)])
+
+        codes = grid.get_bitboards().get_codes()
+        grid.set_cell(cell.CellRiver(Position(2, 1), Directions.left), Position(2, 1))
+        grid.add_wall(Position(0, 0), Directions.right, wall.WallEmpty)
+        bitboards, built_bitboards = grid.get_bitboards(), GridBitboards(grid.get_field())
+        self.assertEqual(bitboards.get_codes().tolist(), built_bitboards.get_codes().tolist())
+        self.assertNotEqual(bitboards.get_codes().tolist(), codes.tolist())
+        self.assertEqual(bitboards.get_conflicts(built_bitboards), 0)
+        for direction in Directions:
+            for wall_type in [wall.WallEmpty, UnknownWall]:
+                self.assertEqual(bitboards.get_walls(direction, wall_type),
+                                 built_bitboards.get_walls(direction, wall_type))
+
+    def test_zobrist_hash(self):
+        grid = make_grid()
+        self.assertIsNone(grid._hash)
+        # hash is updated by changes of grid and of its copy after it is calculated
+        grid.get_hash()
+        other_grid = grid.copy()
+        grid.set_cell(cell.CellRiver(Position(1, 2), Directions.left), Position(1, 2))
+        grid.add_wall(Position(1, 2), Directions.left, wall.WallEmpty)
+        grid.add_wall(Position(0, 0), Directions.right, wall.WallConcrete)
+        self.assertNotEqual(grid.get_hash(), other_grid.get_hash())
+        self.assertFalse(grid.is_same(other_grid))
+
+        other_grid.add_wall(Position(0, 0), Directions.right, wall.WallConcrete)
+        other_grid.set_cell(cell.CellRiver(Position(1, 2), Directions.left), Position(1, 2))
+        other_grid.update_wall(Position(0, 2), Directions.right, wall.WallEmpty)
+        other_grid.merge_with(grid, {})
+        self.assertEqual(grid.get_hash(), other_grid.get_hash())
+        self.assertEqual(grid.get_hash(), grid._calc_hash())
+        self.assertEqual(other_grid.get_hash(), other_grid._calc_hash())
+        self.assertTrue(grid.is_same(other_grid))
+
+    def test_signature(self):
+        grid = make_grid()
+        signature = grid.get_signature()
+        self.assertEqual(signature.known, 0)
+        other_grid = grid.copy()
+        grid.set_cell(cell.CellClinic(Position(1, 1)), Position(1, 1))
+        grid.set_cell(cell.CellRiver(Position(2, 1), Directions.bottom), Position(2, 1))
+        grid.add_wall(Position(2, 1), Directions.left, wall.WallConcrete)
+        self.assertIs(other_grid.get_signature(), signature)
+        for attr in ['known', 'objects', 'rivers']:
+            self.assertEqual(getattr(grid.get_signature(), attr), getattr(Grid(grid.get_field()).get_signature(), attr))
+
+        other_grid.set_cell(cell.CellRiver(Position(2, 1), Directions.bottom), Position(2, 1))
+        self.assertFalse(grid.get_signature().is_conflicting(other_grid.get_signature()))
+        other_grid.set_cell(cell.Cell(Position(1, 1)), Position(1, 1))
+        self.assertTrue(grid.get_signature().is_conflicting(other_grid.get_signature()))
+
+    def test_river_index(self):
+        grid = make_grid(5)
+        grid.get_river_index()
+        grid.set_cell(cell.CellRiver(Position(1, 1), Directions.right), Position(1, 1))
+        grid.set_cell(cell.CellRiver(Position(2, 1), Directions.bottom), Position(2, 1))
+        other_grid = grid.copy()
+        self.assertTrue(grid.has_known_input_river(Position(2, 2), None, ignore_dir=True))
+        self.assertFalse(grid.has_known_input_river(Position(2, 2), Directions.bottom))
+        self.assertTrue(grid.is_river_is_looped(Position(2, 2), grid.get_cell(Position(1, 1))))
+        self.assertFalse(grid.is_river_is_looped(Position(1, 1), grid.get_cell(Position(2, 1))))
+
+        grid.set_cell(cell.CellRiver(Position(2, 2), Directions.left), Position(2, 2))
+        grid.set_cell(cell.CellRiver(Position(1, 2), Directions.top), Position(1, 2))
+        self.assertTrue(grid.is_river_is_looped(Position(1, 2), grid.get_cell(Position(1, 1))))
+        self.assertFalse(other_grid.is_river_is_looped(Position(1, 2), other_grid.get_cell(Position(1, 1))))
+        self.assertFalse(other_grid.has_known_input_river(Position(1, 2), None, ignore_dir=True))
+
+        grid.set_cell(cell.CellRiverMouth(Position(3, 3)), Position(3, 3))
+        for position in [Position(3, 2), Position(2, 3), Position(4, 3)]:
+            grid.set_cell(cell.Cell(position), position)
+        self.assertFalse(grid._is_the_only_allowed_dir(Position(3, 3), Directions.bottom))
+        self.assertTrue(grid.is_cause_of_isolated_mouth(Position(3, 4)))
+        self.assertTrue(grid._is_the_only_allowed_dir(Position(3, 3), Directions.top))
+        self.assertTrue(grid.has_known_input_river(Position(1, 1), Directions.right))
+
+
+class TestBotAI(unittest.TestCase):
+
+    @unittest.skipUnless(parallel_turn.is_available(), 'workers can not be forked')
+    def test_parallel_turn(self):
+        bot, parallel_bot = make_bots(processes=2, parallel_min_leaves=0)
+        _, split_bot = make_bots(processes=3, parallel_min_leaves=0, split_leaves=True)
+        parallel_bots = [parallel_bot, split_bot]
+        turns = [
+            ('p1', 'info', None, cell.CellRiver, None),
+            ('p2', 'info', None, cell.Cell, None),
+            # changes rows which leaves got on previous turn
+            ('p2', 'move', 'right', cell.Cell, wall.WallConcrete),
+            ('p1', 'move', 'right', cell.CellRiver, None),
+        ]
+        for player_name, action, direction, type_cell, wall_type in turns:
+            raw_response = make_response(player_name, action, direction, type_cell, wall_type=wall_type)
+            bot.process_turn_resp(raw_response)
+            for parallel_bot in parallel_bots:
+                parallel_bot.process_turn_resp(raw_response)
+
+        for player_name, player_state in bot.players.items():
+            leaves = player_state.get_leaf_nodes()
+            for parallel_bot in parallel_bots:
+                parallel_leaves = parallel_bot.players[player_name].get_leaf_nodes()
+                self.assertEqual(len(leaves), len(parallel_leaves))
+                for leaf, parallel_leaf in zip(leaves, parallel_leaves):
+                    self.assertEqual(leaf.field_state.get_hash(), parallel_leaf.field_state.get_hash())
+                    self.assertTrue(leaf.field_state.is_same(parallel_leaf.field_state))
+        self.assertGreater(len(bot.players['p1'].get_real_spawn_leaves()), 1)
+
+    @unittest.skipUnless(parallel_turn.is_available(), 'workers can not be forked')
+    def test_parallel_turn_workers(self):
+        bot, parallel_bot = make_bots(processes=2, parallel_min_leaves=0)
+        turn_processor = parallel_bot._turn_processor
+        turns = [
+            ('p1', 'info', None, cell.CellRiver, None),
+            ('p2', 'info', None, cell.Cell, None),
+            ('p2', 'move', 'right', cell.Cell, wall.WallConcrete),
+            ('p1', 'move', 'right', cell.CellRiver, None),
+            ('p1', 'move', 'top', cell.Cell, None),
+            ('p2', 'move', 'bottom', cell.Cell, None),
+        ]
+        workers = []
+        for i, (player_name, action, direction, type_cell, wall_type) in enumerate(turns):
+            raw_response = make_response(player_name, action, direction, type_cell, wall_type=wall_type)
+            # workers get changes of leaves processed in the main process and of leaves made by matching
+            turn_processor._min_leaves = 0 if i % 2 else 10 ** 6
+            for current_bot in [bot, parallel_bot]:
+                current_bot.turn_prepare(player_name, {})
+                current_bot.process_turn_resp(raw_response)
+            workers = workers or [process.pid for process, _ in turn_processor._workers]
+        self.assertEqual([process.pid for process, _ in turn_processor._workers], workers)
+
+        loaded_bot = pickle.loads(pickle.dumps(parallel_bot))
+        raw_response = make_response('p1', 'move', 'left', cell.Cell)
+        for current_bot in [bot, loaded_bot]:
+            current_bot.turn_prepare('p1', {})
+            current_bot.process_turn_resp(raw_response)
+        self.assertTrue(loaded_bot._turn_processor._workers)
+        for player_name, player_state in bot.players.items():
+            leaves = player_state.get_leaf_nodes()
+            loaded_leaves = loaded_bot.players[player_name].get_leaf_nodes()
+            self.assertEqual(len(leaves), len(loaded_leaves))
+            for leaf, loaded_leaf in zip(leaves, loaded_leaves):
+                self.assertTrue(leaf.field_state.is_same(loaded_leaf.field_state))
+
+    def test_default_bot_rules(self):
+        # rules of rooms created before bot rules were added have none of them
+        rules = {key: value for key, value in get_rules().items() if key != 'bot_rules'}
+        bot = BotAI(rules, {'p1': Position(1, 1), 'p2': Position(2, 3)})
+        default_bot, _ = make_bots()
+        self.assertEqual(bot._compact_every, get_rules()['bot_rules']['compact_every'])
+        self.assertEqual(vars(bot._common_data) | {'_rules': None}, vars(default_bot._common_data) | {'_rules': None})
+
+    def test_legacy_pickle(self):
+        bot, _ = make_bots()
+        bot.process_turn_resp(make_response('p1', 'info', None, cell.CellRiver))
+        legacy_bot = pickle.loads(pickle.dumps(bot))
+        # attributes added after bots were saved by the first versions of the game
+        added_attributes = {
+            BotAI: ['_compact_every', '_turns_processed', '_turn_processor'],
+            PlayerState: ['_leaf_index', '_random'],
+            Node: ['weight', 'leaf_index', 'path_compatibility', 'is_path_real_spawn'],
+            FieldState: ['_players_key', '_treasures_key'],
+            CommonData: ['is_dedupe_leaves', 'max_leaves'],
+            LeavesMatcher: ['_unique_objs_codes', '_unique_objs_indexes', '_is_factorized_opponents'],
+            DecisionMaker: ['_is_factorized_opponents'],
+        }
+        legacy_bot._common_data._rules = {key: value for key, value in get_rules().items() if key != 'bot_rules'}
+        objects = [legacy_bot, legacy_bot.leaves_matcher, legacy_bot.decision_maker, legacy_bot._common_data]
+        for player_state in legacy_bot.players.values():
+            objects.append(player_state)
+            nodes = [player_state._root]
+            while nodes:
+                node = nodes.pop()
+                objects += [node, node.field_state]
+                nodes += node.next_states
+        for obj in objects:
+            for name in added_attributes.get(type(obj), []):
+                vars(obj).pop(name, None)
+        loaded_bot = pickle.loads(pickle.dumps(legacy_bot))
+
+        raw_response = make_response('p2', 'move', 'right', cell.Cell)
+        loaded_bot.turn_prepare('p2', {})
+        loaded_bot.process_turn_resp(raw_response)
+        bot.turn_prepare('p2', {})
+        bot.process_turn_resp(raw_response)
+        for player_name, player_state in bot.players.items():
+            self.assertEqual([leaf.field_state.get_hash() for leaf in player_state.get_leaf_nodes()],
+                             [leaf.field_state.get_hash() for leaf in loaded_bot.players[player_name].get_leaf_nodes()])
+
+
+class TestLeavesMatcher(unittest.TestCase):
+
+    def test_match_batch(self):
+        rnd = random.Random(0)
+        bot = BotAI(get_rules(), {'p1': Position(1, 1), 'p2': Position(2, 3)})
+        cell_types = [cell.Cell, cell.CellClinic, cell.CellRiverMouth, UnknownCell]
+        nodes = {}
+        for player_name, player_state in bot.players.items():
+            nodes[player_name] = player_state.get_leaf_nodes()
+            for node in nodes[player_name]:
+                grid = node.field_state.field
+                for _ in range(6):
+                    position = Position(rnd.randint(1, 5), rnd.randint(1, 5))
+                    if rnd.random() < 0.3:
+                        new_cell = cell.CellRiver(position, rnd.choice(list(Directions)))
+                    else:
+                        new_cell = rnd.choice(cell_types)(position)
+                    grid.set_cell(new_cell, position)
+
+        matcher = bot.leaves_matcher
+        for node in nodes['p1']:
+            expected = [other_node for other_node in nodes['p2'] if matcher._is_grids_matchable(node, other_node)]
+            self.assertEqual(matcher._match_batch(node, nodes['p2']), expected)
+            # signatures reject only not matchable grids
+            self.assertTrue(all(matcher._is_signatures_matchable(node, other_node) for other_node in expected))
+        self.assertTrue(any(matcher._match_batch(node, nodes['p2']) for node in nodes['p1']))
+
+    def test_factorized_opponents(self):
+        bot, factorized_bot = make_bots(factorized_opponents=True)
+        turns = [
+            ('p1', 'right', cell.CellRiverMouth),
+            ('p2', 'bottom', cell.CellRiverMouth),
+            ('p2', 'right', cell.Cell),
+            ('p2', 'bottom', cell.Cell),
+            ('p2', 'bottom', cell.CellClinic),
+        ]
+        for player_name, direction, type_cell in turns:
+            raw_response = make_response(player_name, 'move', direction, type_cell)
+            for game_bot in [bot, factorized_bot]:
+                game_bot.turn_prepare(player_name, {})
+                game_bot.process_turn_resp(raw_response)
+        bot.turn_prepare('p1', {})
+        factorized_bot.turn_prepare('p1', {})
+
+        # leaf is not split by positions of p2, they are joined from p2 leaves compatible with it
+        leaves = bot.players['p1'].get_real_spawn_leaves()
+        factorized_leaves = factorized_bot.players['p1'].get_real_spawn_leaves()
+        self.assertGreater(len(leaves), 1)
+        self.assertEqual(len(factorized_leaves), 1)
+        self.assertIsNone(factorized_leaves[0].field_state.get_player_pos('p2'))
+        self.assertEqual(factorized_bot.decision_maker._get_player_positions(factorized_leaves[0], 'p2'),
+                         {leaf.field_state.get_player_pos('p2') for leaf in leaves})
+
+
+class TestPlayerState(unittest.TestCase):
+
+    def test_leaf_index(self):
+        bot = BotAI(get_rules(), {'p1': Position(1, 1), 'p2': Position(2, 3)})
+        player_state = bot.players['p1']
+        leaves = player_state.get_leaf_nodes()
+        self.assertEqual(len(player_state.get_real_spawn_leaves()), 1)
+
+        # chain deeper than recursion limit
+        leaf = leaves[3]
+        for _ in range(2000):
+            leaf.add_next_state(leaf.field_state.copy())
+            leaf = leaf.next_states[0]
+        leaf.add_next_state(leaf.field_state.copy())
+        leaf.add_next_state(leaf.field_state.copy())
+        self.assertEqual(player_state.get_leaf_nodes(), leaves[:3] + leaf.next_states + leaves[4:])
+
+        leaf.next_states[0].update_compatibility('p2', False)
+        self.assertEqual(len(player_state.get_compatible_leaves('p2')), len(leaves))
+        self.assertNotIn(leaf.next_states[0], player_state.get_compatible_leaves('p2'))
+        leaf.next_states[0].remove()
+        self.assertEqual(player_state.get_subtrees_leaf_nodes([leaves[3]]), leaf.next_states)
+        leaf.next_states[0].remove()
+        self.assertEqual(player_state.get_leaf_nodes(), leaves[:3] + leaves[4:])
+
+    def test_compact_tree(self):
+        bot = BotAI(get_rules(), {'p1': Position(1, 1), 'p2': Position(2, 3)})
+        player_state = bot.players['p1']
+        leaves = player_state.get_leaf_nodes()
+        chain = [leaves[3]]
+        for _ in range(3):
+            chain[-1].add_next_state(chain[-1].field_state.copy())
+            chain.append(chain[-1].next_states[0])
+        chain[-1].add_next_state(chain[-1].field_state.copy())
+        chain[-1].add_next_state(chain[-1].field_state.copy())
+        chain[-1].next_states[1].update_compatibility('p2', False)
+        expected_leaves = player_state.get_leaf_nodes()
+        expected_compatible_leaves = player_state.get_compatible_leaves('p2')
+        other_leaf = bot.players['p2'].get_leaf_nodes()[0]
+        other_leaf.compatible_with['p1'] = [chain[1]]
+
+        bot.compact_trees()
+        self.assertEqual(player_state.get_leaf_nodes(), expected_leaves)
+        self.assertEqual(player_state.get_compatible_leaves('p2'), expected_compatible_leaves)
+        self.assertIs(chain[-1].get_parent(), chain[0].get_parent())
+        self.assertIsNone(chain[-1].field_state)
+        self.assertEqual(other_leaf.compatible_with['p1'], [chain[-1]])
+        self.assertEqual(player_state.get_subtrees_leaf_nodes(other_leaf.compatible_with['p1']),
+                         chain[-1].next_states)
+
+    def test_dedupe_leaves(self):
+        bot = BotAI(get_rules(), {'p1': Position(1, 1), 'p2': Position(2, 3)})
+        player_state = bot.players['p1']
+        leaves = player_state.get_leaf_nodes()
+        first_leaf, second_leaf = leaves[3], leaves[4]
+        first_leaf.field_state.get_hash()
+        # the same state is got in two branches, second branch has another leaf too
+        for leaf, position in [(first_leaf, Position(3, 3)), (second_leaf, Position(3, 3)), (second_leaf, Position(4, 4))]:
+            field_state = leaf.field_state.copy(player_position=('p1', position))
+            field_state.field.set_cell(cell.CellClinic(Position(5, 5)), Position(5, 5))
+            leaf.add_next_state(field_state)
+        second_leaf.split_weight()
+        kept_leaf, removed_leaf, other_leaf = first_leaf.next_states[0], *second_leaf.next_states
+        self.assertEqual(kept_leaf.field_state._players_key, get_players_key(kept_leaf.field_state.players_positions))
+        other_leaves = bot.players['p2'].get_leaf_nodes()
+        other_leaves[0].compatible_with['p1'] = [removed_leaf]
+        other_leaves[1].compatible_with['p1'] = [second_leaf]
+        other_leaves[2].compatible_with['p1'] = [first_leaf, removed_leaf]
+
+        bot.dedupe_leaves()
+        self.assertEqual(player_state.get_leaf_nodes(), leaves[:3] + [kept_leaf, other_leaf] + leaves[5:])
+        self.assertEqual(kept_leaf.weight, first_leaf.weight + removed_leaf.weight)
+        self.assertEqual(other_leaves[0].compatible_with['p1'], [kept_leaf])
+        self.assertEqual(other_leaves[1].compatible_with['p1'], [second_leaf, kept_leaf])
+        self.assertEqual(other_leaves[2].compatible_with['p1'], [first_leaf])
+
+    def test_resample_leaves(self):
+        rules = get_rules()
+        rules['bot_rules']['max_leaves'] = 3
+        bot = BotAI(rules, {'p1': Position(1, 1), 'p2': Position(2, 3)})
+        player_state = bot.players['p1']
+        real_spawn_leaves = player_state.get_real_spawn_leaves()
+        self.assertGreater(len(player_state.get_leaf_nodes()), 3)
+
+        player_state.resample_leaves()
+        leaves = player_state.get_leaf_nodes()
+        self.assertEqual(len(leaves), 3)
+        self.assertEqual(player_state.get_real_spawn_leaves(), real_spawn_leaves)
+        self.assertAlmostEqual(sum(leaf.weight for leaf in leaves), 1)
+        self.assertFalse(player_state.is_depleted())
+
+    def test_reseed_leaves(self):
+        rules = get_rules()
+        rules['bot_rules']['max_leaves'] = 3
+        bot = BotAI(rules, {'p1': Position(1, 1), 'p2': Position(2, 3)})
+        player_state, other_state = bot.players['p1'], bot.players['p2']
+        [leaf.remove() for leaf in player_state.get_real_spawn_leaves()]
+        leaves = player_state.get_leaf_nodes()
+        self.assertTrue(player_state.is_depleted())
+
+        bot._reseed_leaves('p1')
+        self.assertEqual(player_state.get_real_spawn_leaves(), leaves)
+        self.assertEqual(leaves[0].compatible_with['p2'], other_state.get_leaf_nodes())
+        self.assertEqual(other_state.get_real_spawn_leaves()[0].compatible_with['p1'], leaves)
+
+        [leaf.remove() for leaf in leaves]
+        bot._reseed_leaves('p1')
+        leaves = player_state.get_real_spawn_leaves()
+        self.assertEqual(len(leaves), rules['generator_rules']['rows'] * rules['generator_rules']['cols'])
+        self.assertAlmostEqual(sum(leaf.weight for leaf in leaves), 1)
+        self.assertFalse(player_state.is_depleted())
@@ -0,0 +1,407 @@
+import pickle
+import random
+import threading
+import unittest
+from copy import deepcopy
+
+from game_core.game_engine import Game, get_rules
+from game_core.game_engine.field.field import Field
+from game_core.game_engine.field.cell import Cell, CellRiver, NoneCell
+from game_core.game_engine.field.wall import WallConcrete, WallEmpty
+from game_core.game_engine.field_generator.map_generator import MapGenerator
+from game_core.game_engine.global_env.enums import Actions, Directions
+from game_core.game_engine.global_env.types import LevelPosition, Position, intern_positions
+
+
+def make_game(seed: int, level_backend: str = 'list', size: int = 5,
+              treasures: list[int] = None) -> tuple[Game, dict]:
+    rules = get_rules()
+    rules['generator_rules']['seed'] = seed
+    rules['generator_rules']['rows'] = rules['generator_rules']['cols'] = size
+    rules['generator_rules']['treasures'] = treasures if treasures else [2, 2, 1]
+    rules['generator_rules']['level_backend'] = level_backend
+    game = Game(rules)
+    for i in range(3):
+        game.field.spawn_player({'x': i + 1, 'y': i + 1}, f'player_{i}', turn=i)
+    game.field.sort_players()
+    return game, rules
+
+
+def play_random_turns(game: Game, rules: dict, seed: int, turns: int = 100) -> list:
+    rnd = random.Random(seed)
+    log = []
+    for _ in range(turns):
+        abilities = game.get_allowed_abilities(game.get_current_player())
+        action = rnd.choice([action for action, is_allowed in abilities.items() if is_allowed])
+        direction = rnd.choice(list(Directions)).name \
+            if action in [Actions.move, Actions.shoot_bow, Actions.throw_bomb] else None
+        response, _ = game.make_turn(action.name, direction)
+        log.append((response.get_info(), game.get_treasures_list(), game.get_players_positions()))
+        if game.is_win_condition(rules):
+            break
+    return log
+
+
+class TestArrayGameLevel(unittest.TestCase):
+
+    def test_same_field(self):
+        for seed in range(5):
+            list_game, _ = make_game(seed)
+            array_game, _ = make_game(seed, 'array')
+            self.assertEqual(list_game.get_field_list(), array_game.get_field_list())
+
+    def test_same_turns(self):
+        for seed in range(5):
+            list_game, rules = make_game(seed)
+            array_game, _ = make_game(seed, 'array')
+            self.assertEqual(play_random_turns(list_game, rules, seed), play_random_turns(array_game, rules, seed))
+
+    def test_pickle(self):
+        list_game, rules = make_game(0, size=20)
+        array_game, _ = make_game(0, 'array', size=20)
+        play_random_turns(list_game, rules, 0, turns=10)
+        play_random_turns(array_game, rules, 0, turns=10)
+        array_data = pickle.dumps(array_game)
+        array_map_size = len(pickle.dumps(array_game.field.game_map))
+        self.assertLess(array_map_size, len(pickle.dumps(list_game.field.game_map)) // 4)
+
+        restored_game = pickle.loads(array_data)
+        self.assertEqual(play_random_turns(list_game, rules, 1), play_random_turns(restored_game, rules, 1))
+
+
+class LegacyPickle:
+    """is pickled like object of cls with given fields was pickled before positions were interned"""
+    def __init__(self, cls: type, **fields):
+        self.cls = cls
+        self.fields = fields
+
+    def __reduce_ex__(self, protocol):
+        # old objects were created by __new__ of their class without arguments
+        return self.cls.__new__, (self.cls,), (None, self.fields) if hasattr(self.cls, '__slots__') else self.fields
+
+
+def make_legacy_position(position: Position) -> LegacyPickle:
+    level_position = position.level_position
+    return LegacyPickle(Position, x=position.x, y=position.y, level_position=LegacyPickle(
+        LevelPosition, level=level_position.level, sub_level=level_position.sub_level,
+        dimension=level_position.dimension))
+
+
+class TestTreasuresIndex(unittest.TestCase):
+
+    def test_index_matches_treasures(self):
+        for seed in range(5):
+            game, rules = make_game(seed, size=10, treasures=[5, 10, 10])
+            rules['gameplay_rules']['fast_win'] = False
+            for turn_seed in range(10):
+                play_random_turns(game, rules, turn_seed, turns=20)
+                level = game.field.game_map.get_level(LevelPosition(0, 0, 0))
+                for row in level.field:
+                    for cell in row:
+                        self.assertEqual(
+                            game.field._treasures_on_cell(cell),
+                            [treasure for treasure in game.field.treasures if treasure.position == cell.position])
+
+    def test_legacy_pickle(self):
+        game, rules = make_game(0, size=10, treasures=[5, 10, 10])
+        treasures = list(game.field.treasures)
+        # treasures were not indexed, so some of them may lie on the same cell
+        treasures[1].position = treasures[0].position
+        for treasure in treasures:
+            treasure.position = make_legacy_position(treasure.position)
+        game.field = LegacyPickle(Field, **{name: value for name, value in vars(game.field).items() if name in (
+            'gameplay_rules', 'game_map', 'exit_cells', 'treasures', 'players', '_active_player_idx', '_is_host_turn')})
+        loaded_game = pickle.loads(pickle.dumps(game))
+
+        level = loaded_game.field.game_map.get_level(LevelPosition(0, 0, 0))
+        cells_treasures = [loaded_game.field._treasures_on_cell(cell) for row in level.field for cell in row]
+        self.assertEqual(sum(len(cell_treasures) for cell_treasures in cells_treasures), len(treasures))
+        self.assertTrue(any(len(cell_treasures) > 1 for cell_treasures in cells_treasures))
+        for cell_treasures in cells_treasures:
+            for treasure in cell_treasures:
+                self.assertIs(treasure.position, cell_treasures[0].position)
+        play_random_turns(loaded_game, rules, 0, turns=20)
+
+
+class TestPosition(unittest.TestCase):
+
+    def test_interning(self):
+        level_position = LevelPosition(0, 0, 0)
+        self.assertIs(level_position, LevelPosition(0, 0))
+        self.assertIs(Position(1, 2, level_position), Position(1, 2, LevelPosition(0, 0, 0)))
+        self.assertIs(Position(1, 2, level_position).get_adjacent(Directions.right), Position(2, 2, level_position))
+        self.assertIsNot(Position(1, 2), Position(1, 2, level_position))
+        self.assertEqual(len({Position(1, 2), Position(1, 2), Position(2, 1)}), 2)
+
+    def test_immutable(self):
+        position = Position(1, 2)
+        with self.assertRaises(AttributeError):
+            position.x = 2
+
+    def test_copy(self):
+        position = Position(1, 2, LevelPosition(0, 0, 0))
+        self.assertIs(deepcopy(position), position)
+        self.assertIs(pickle.loads(pickle.dumps(position)), position)
+
+    def test_legacy_pickle(self):
+        level_position = LegacyPickle(LevelPosition, level=0, sub_level=0, dimension=0)
+        legacy_position = LegacyPickle(Position, x=1, y=2, level_position=level_position)
+        game, _ = make_game(0)
+        game.field.legacy = [legacy_position, (legacy_position, 1), {'position': legacy_position}]
+        loaded_game = pickle.loads(pickle.dumps(game))
+
+        position = Position(1, 2, LevelPosition(0, 0, 0))
+        self.assertIs(loaded_game.field.legacy[0], position)
+        self.assertEqual(loaded_game.field.legacy[1], (position, 1))
+        self.assertIs(loaded_game.field.legacy[2]['position'], position)
+        self.assertIs(loaded_game.field.players[0].cell.position, game.field.players[0].cell.position)
+
+    def test_legacy_pickle_threads(self):
+        position = Position(1, 2, LevelPosition(0, 0, 0))
+        holder = {'position': pickle.loads(pickle.dumps(make_legacy_position(position)))}
+        # other room is loaded in other thread before positions of this one are interned
+        thread = threading.Thread(target=intern_positions, args=({},))
+        thread.start()
+        thread.join()
+        intern_positions(holder)
+        self.assertIs(holder['position'], position)
+
+
+class TestRiverTopology(unittest.TestCase):
+
+    def test_links_match_river(self):
+        for level_backend in ['list', 'array']:
+            for seed in range(5):
+                game, _ = make_game(seed, level_backend, size=10)
+                level = game.field.game_map.get_level(LevelPosition(0, 0, 0))
+                for row in level.field:
+                    for cell in row:
+                        if not isinstance(cell, CellRiver):
+                            continue
+                        river = list(cell.river)
+                        idx = river.index(cell)
+                        self.assertEqual(cell.river_idx, idx)
+                        self.assertIs(level.get_cell(cell.position), cell)
+                        if idx == len(river) - 1:
+                            self.assertIsNone(cell.next_cell)
+                        else:
+                            self.assertIs(cell.next_cell, river[idx + 1])
+                            self.assertIs(cell.next_next_cell, river[min(idx + 2, len(river) - 1)])
+
+    def test_legacy_pickle(self):
+        game, _ = make_game(0, size=10)
+        level = game.field.game_map.get_level(LevelPosition(0, 0, 0))
+        river_cells = [cell for row in level.field for cell in row if isinstance(cell, CellRiver)]
+        links = [(cell.river_id, cell.river_idx) for cell in river_cells]
+        for cell in river_cells:
+            for name in ('river_id', 'river_idx', 'next_cell', 'next_next_cell'):
+                delattr(cell, name)
+        loaded_level = pickle.loads(pickle.dumps(level))
+
+        loaded_cells = [cell for row in loaded_level.field for cell in row if isinstance(cell, CellRiver)]
+        self.assertEqual(len({cell.river_id for cell in loaded_cells}), len({river_id for river_id, _ in links}))
+        self.assertEqual([cell.river_idx for cell in loaded_cells], [river_idx for _, river_idx in links])
+        for cell in loaded_cells:
+            is_mouth = cell.river_idx == len(cell.river) - 1
+            self.assertIs(cell.next_cell, None if is_mouth else cell.river[cell.river_idx + 1])
+
+
+class TestTransitions(unittest.TestCase):
+
+    def test_break_wall_invalidates_transitions(self):
+        for level_backend in ['list', 'array']:
+            game, _ = make_game(0, level_backend, size=10)
+            level = game.field.game_map.get_level(LevelPosition(0, 0, 0))
+            cell = next(cell for row in level.field for cell in row
+                        if type(cell) is Cell and type(cell.walls[Directions.right]) is WallConcrete and
+                        type(level.get_neighbour_cell(cell.position, Directions.right)) is Cell)
+            self.assertIs(level.get_transition(cell, Directions.right)[1], cell)
+            game.field.break_wall(cell, Directions.right)
+            neighbour = level.get_neighbour_cell(cell.position, Directions.right)
+            self.assertIs(level.get_transition(cell, Directions.right)[1], neighbour)
+            self.assertIs(level.get_transition(neighbour, Directions.left)[1], cell)
+
+
+class TestLineOfSight(unittest.TestCase):
+
+    @staticmethod
+    def walk(level, position: Position, direction: Directions, positions: set[Position]) -> Position | None:
+        while position not in positions:
+            if level.get_cell(position).walls[direction].weapon_collision:
+                return None
+            position = level.get_neighbour_cell(position, direction).position
+        return position
+
+    def test_first_seen_matches_walk(self):
+        for seed in range(5):
+            game, rules = make_game(seed, size=10)
+            play_random_turns(game, rules, seed, turns=30)
+            level = game.field.game_map.get_level(LevelPosition(0, 0, 0))
+            positions = [cell.position for row in level.field for cell in row if type(cell) is not NoneCell]
+            rnd = random.Random(seed)
+            for _ in range(100):
+                targets = set(rnd.sample(positions, 3))
+                position = rnd.choice(positions)
+                for direction in Directions:
+                    self.assertIs(level.line_of_sight.get_first_seen(position, direction, targets),
+                                  self.walk(level, position, direction, targets))
+
+    def test_players_on_cells(self):
+        for seed in range(5):
+            game, rules = make_game(seed, size=10)
+            play_random_turns(game, rules, seed, turns=50)
+            players_on_cells = {}
+            for player in game.field.players:
+                players_on_cells.setdefault(player.cell.position, []).append(player)
+            self.assertEqual(game.field._get_players_on_cells(), players_on_cells)
+
+    def test_removed_player_is_not_shot(self):
+        game, rules = make_game(0)
+        field = game.field
+        active_player, removed_player = field.players[0], field.players[1]
+        field._get_players_on_cells()
+        field._move_player(removed_player, active_player.cell)
+        field.remove_player(removed_player.name)
+        self.assertEqual(field._check_players(active_player.cell), [])
+
+        response, _ = game.make_turn(Actions.shoot_bow.name, Directions.top.name)
+        self.assertFalse(response.hit)
+        self.assertEqual(removed_player.health, rules['player_stat']['max_health'])
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def test_restore(self):
+        for level_backend in ['list', 'array']:
+            for seed in range(5):
+                game, rules = make_game(seed, level_backend)
+                rules['gameplay_rules']['fast_win'] = False
+                play_random_turns(game, rules, seed, turns=20)
+                snapshot = game.snapshot()
+                field_list = game.get_field_list()
+                log = play_random_turns(game, rules, seed + 1)
+                for _ in range(2):
+                    game.restore(snapshot)
+                    self.assertEqual(game.get_field_list(), field_list)
+                    self.assertEqual(play_random_turns(game, rules, seed + 1), log)
+
+    def test_clone(self):
+        for level_backend in ['list', 'array']:
+            for seed in range(5):
+                game, rules = make_game(seed, level_backend)
+                rules['gameplay_rules']['fast_win'] = False
+                play_random_turns(game, rules, seed, turns=20)
+                field_list = game.get_field_list()
+                clone = game.clone()
+                self.assertIs(clone.field.game_map, game.field.game_map)
+                log = play_random_turns(clone, rules, seed + 1)
+                self.assertEqual(game.get_field_list(), field_list)
+                self.assertEqual(play_random_turns(game, rules, seed + 1), log)
+
+
+class TestJournal(unittest.TestCase):
+
+    @staticmethod
+    def get_state(game: Game):
+        return (game.get_field_list(), game.get_treasures_list(), game.get_players_data(),
+                game.get_players_positions(), game.get_current_player().name)
+
+    def check_undo_redo(self, game: Game, rules: dict, seed: int, turns: int):
+        game.field.enable_journal()
+        states = [self.get_state(game)]
+        rnd = random.Random(seed)
+        for _ in range(turns):
+            play_random_turns(game, rules, rnd.random(), turns=1)
+            states.append(self.get_state(game))
+        for state in reversed(states[:-1]):
+            self.assertTrue(game.field.undo())
+            self.assertEqual(self.get_state(game), state)
+        self.assertFalse(game.field.undo())
+        for state in states[1:]:
+            self.assertTrue(game.field.redo())
+            self.assertEqual(self.get_state(game), state)
+        self.assertFalse(game.field.redo())
+
+    def test_undo_redo(self):
+        for level_backend in ['list', 'array']:
+            for seed in range(5):
+                game, rules = make_game(seed, level_backend)
+                rules['gameplay_rules']['fast_win'] = False
+                self.check_undo_redo(game, rules, seed, turns=60)
+
+                for _ in range(10):
+                    game.field.undo()
+                play_random_turns(game, rules, seed, turns=20)
+                self.assertFalse(game.field.redo())
+                game.restore(game.snapshot())
+                self.assertFalse(game.field.undo())
+
+    def test_undo_clone(self):
+        game, rules = make_game(0, size=10)
+        level = game.field.game_map.get_level(LevelPosition(0, 0, 0))
+        cell, direction = next(
+            (cell, direction) for row in level.field for cell in row for direction in Directions
+            if type(cell) is Cell and type(cell.walls[direction]) is WallConcrete
+            and type(level.get_neighbour_cell(cell.position, direction)) is Cell)
+        clone = game.clone()
+        player = clone.get_current_player()
+        player.cell = clone.field.game_map.get_cell(cell.position)
+        clone.field._players_on_cells = None
+        clone.field.enable_journal()
+
+        # the first broken wall makes the clone copy the map, undo has to move player to a cell of the copy
+        clone.make_turn(Actions.throw_bomb.name, direction.name)
+        clone.field.undo()
+        self.assertIs(player.cell, clone.field.game_map.get_cell(cell.position))
+        clone.make_turn(Actions.throw_bomb.name, direction.name)
+        while clone.get_current_player() is not player:
+            clone.make_turn(Actions.info.name)
+        clone.make_turn(Actions.move.name, direction.name)
+        self.assertIs(player.cell.position, cell.position.get_adjacent(direction))
+        self.assertIs(type(game.field.game_map.get_cell(cell.position).walls[direction]), WallConcrete)
+
+    def test_undo_treasures_on_exit(self):
+        game, rules = make_game(1, size=4)
+        rules['gameplay_rules']['fast_win'] = False
+        self.check_undo_redo(game, rules, 1, turns=200)
+
+
+class TestMapGenerator(unittest.TestCase):
+
+    @staticmethod
+    def get_rules_list() -> list[dict]:
+        rules_list = []
+        for seed in range(4):
+            rules = get_rules()
+            rules['generator_rules']['seed'] = seed
+            rules['bots_amount'] = 2
+            rules_list.append(rules)
+        return rules_list
+
+    def test_global_random_is_not_used(self):
+        random.seed(0)
+        state = random.getstate()
+        Game(self.get_rules_list()[0])
+        self.assertEqual(random.getstate(), state)
+
+    def test_generate_many(self):
+        rules_list = self.get_rules_list()
+        expected = [Game(rules) for rules in rules_list]
+        generator_rules = [rules['generator_rules'] for rules in rules_list]
+        for use_processes in [False, True]:
+            generators = MapGenerator.generate_many(generator_rules, max_workers=2, use_processes=use_processes)
+            for rules, generator, game in zip(rules_list, generators, expected):
+                generated_game = Game(rules, generator)
+                self.assertEqual(generated_game.get_field_list(), game.get_field_list())
+                self.assertEqual(generated_game.get_spawn_points(), game.get_spawn_points())
+
+
+class TestWalls(unittest.TestCase):
+
+    def test_singletons(self):
+        self.assertIs(WallConcrete(), WallConcrete())
+        self.assertIsNot(WallConcrete(), WallEmpty())
+        self.assertIs(deepcopy(WallConcrete()), WallConcrete())
+        self.assertIs(pickle.loads(pickle.dumps(WallConcrete())), WallConcrete())
+        with self.assertRaises(AttributeError):
+            WallConcrete().breakable = False
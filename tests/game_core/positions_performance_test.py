@@ -0,0 +1,94 @@
+import argparse
+import random
+import timeit
+
+from game_core.game_engine import Game, get_rules
+from game_core.game_engine.global_env.enums import Actions, Directions
+from game_core.game_engine.global_env.types import LevelPosition, Position
+
+
+class ValueLevelPosition:
+    """level position compared by value, as it was before interning"""
+    __slots__ = 'level', 'sub_level', 'dimension'
+
+    def __init__(self, level_position: LevelPosition):
+        self.level = level_position.level
+        self.sub_level = level_position.sub_level
+        self.dimension = level_position.dimension
+
+    def __eq__(self, other: 'ValueLevelPosition'):
+        return self.level == other.level and self.sub_level == other.sub_level and self.dimension == other.dimension
+
+
+class ValuePosition:
+    """position compared by value, as it was before interning"""
+    __slots__ = 'x', 'y', 'level_position'
+
+    def __init__(self, position: Position):
+        self.x = position.x
+        self.y = position.y
+        self.level_position = ValueLevelPosition(position.level_position)
+
+    def __eq__(self, other: 'ValuePosition'):
+        level_pos_eq = self.level_position == other.level_position if self.level_position else True
+        return self.x == other.x and self.y == other.y and level_pos_eq
+
+
+def create_game(seed: int, num_players: int, turns: int) -> Game:
+    rules = get_rules()
+    rules['generator_rules']['seed'] = seed
+    rules['generator_rules']['rows'] = rules['generator_rules']['cols'] = 10
+    rules['generator_rules']['treasures'] = [5, 10, 10]
+    rules['gameplay_rules']['fast_win'] = False
+    rules['bots_amount'] = num_players
+    game = Game(rules)
+    game.field.sort_players()
+
+    rnd = random.Random(seed)
+    for _ in range(turns):
+        abilities = game.get_allowed_abilities(game.get_current_player())
+        action = rnd.choice([action for action, is_allowed in abilities.items() if is_allowed and
+                             action is not Actions.shoot_bow])
+        direction = rnd.choice(list(Directions)).name if action in [Actions.move, Actions.throw_bomb] else None
+        game.make_turn(action.name, direction)
+    return game
+
+
+def lookups_test(cells: list, players: list, treasures: list, treasures_index, number: int) -> dict[str, float]:
+    lookups = {
+        'treasures on cell': lambda: [[tr for tr in treasures if cell == tr] for cell in cells],
+        'players on cell': lambda: [[pl for pl in players if cell == pl] for cell in cells],
+        'cell has treasure': lambda: [cell in treasures_index for cell in cells],
+    }
+    return {name: timeit.timeit(lookup, number=number) for name, lookup in lookups.items()}
+
+
+def performance_test(seed: int, num_players: int = 10, turns: int = 200, number: int = 200):
+    game = create_game(seed, num_players, turns)
+    level = game.field.game_map.get_level(LevelPosition(0, 0, 0))
+    cells = [cell.position for row in level.field for cell in row]
+    players = [player.cell.position for player in game.field.players]
+    treasures = [treasure.position for treasure in game.field.treasures if treasure.position]
+
+    interned = lookups_test(cells, players, treasures, set(treasures), number)
+    value_cells = [ValuePosition(position) for position in cells]
+    value_players = [ValuePosition(position) for position in players]
+    value_treasures = [ValuePosition(position) for position in treasures]
+    by_value = lookups_test(value_cells, value_players, value_treasures, value_treasures, number)
+
+    print(f'seed: {seed}, players: {len(players)}, treasures: {len(treasures)}, cells: {len(cells)}')
+    for name, interned_time in interned.items():
+        value_time = by_value[name]
+        print(f'{name:>18}: by value {value_time * 1000:8.2f} ms, '
+              f'interned {interned_time * 1000:8.2f} ms, x{value_time / interned_time:.1f}')
+
+
+def main(args):
+    performance_test(args.seed, args.players)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--players", type=int, default=10)
+    main(parser.parse_args())